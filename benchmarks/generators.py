@@ -0,0 +1,82 @@
+import random
+import string
+
+"""
+Seeded generators of synthetic DSL documents. The same (size, seed) always
+gives the same document, so timings can be compared across runs.
+"""
+
+ENCLOSURES = ('[{}]', '({})')
+
+
+def label(rng: random.Random, length: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(''.join(rng.choices(string.ascii_letters, k=rng.randint(2, 9))))
+    return ' '.join(words)[:length].strip()
+
+
+def var(i: int) -> str:
+    """Variable name of node i, identifiers are letters only"""
+    name = ''
+    while True:
+        i, digit = divmod(i, 26)
+        name = string.ascii_lowercase[digit] + name
+        if not i:
+            return 'n' + name
+
+
+def definitions(rng: random.Random, size: int, label_length: int):
+    return [f'{var(i)} := "{label(rng, label_length)}"' for i in range(size)]
+
+
+def node(rng: random.Random, i: int) -> str:
+    # Each node keeps one enclosure, else it would be two nodes
+    return ENCLOSURES[i % len(ENCLOSURES)].format(var(i))
+
+
+def long_chain(size: int, seed: int = 0) -> str:
+    """Node 0 -> node 1 -> ... -> last node, ten nodes per line"""
+    rng = random.Random(seed)
+    lines = definitions(rng, size, 12)
+    for start in range(0, size - 1, 9):
+        ids = range(start, min(start + 10, size))
+        lines.append(' -> '.join(node(rng, i) for i in ids))
+    return '\n'.join(lines)
+
+
+def fan_out(size: int, seed: int = 0) -> str:
+    """One root linked to every other node"""
+    rng = random.Random(seed)
+    lines = definitions(rng, size, 12)
+    lines += [f'{node(rng, 0)} -> {node(rng, i)}' for i in range(1, size)]
+    return '\n'.join(lines)
+
+
+def dense_cyclic(size: int, seed: int = 0, degree: int = 4) -> str:
+    """A ring through every node plus `degree - 1` random links per node"""
+    rng = random.Random(seed)
+    lines = definitions(rng, size, 12)
+    links = set()
+    for i in range(size):
+        links.add((i, (i + 1) % size))
+        for dest in rng.sample(range(size), min(size, degree - 1)):
+            if dest != i:
+                links.add((i, dest))
+    lines += [f'{node(rng, a)} -> {node(rng, b)}' for a, b in sorted(links)]
+    return '\n'.join(lines)
+
+
+def long_labels(size: int, seed: int = 0, length: int = 120) -> str:
+    """A chain of inline string nodes with long labels"""
+    rng = random.Random(seed)
+    labels = [f'["{label(rng, length)} {i}"]' for i in range(size)]
+    return '\n'.join(' -> '.join(labels[i:i + 2]) for i in range(size - 1))
+
+
+GENERATORS = {
+    'long_chain': long_chain,
+    'fan_out': fan_out,
+    'dense_cyclic': dense_cyclic,
+    'long_labels': long_labels,
+}
@@ -0,0 +1,190 @@
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PIL  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from diagrams import renderer  # noqa: E402
+from diagrams.parser import GraphBuilder, iter_events  # noqa: E402
+from diagrams.pillow_backend import PillowBackend  # noqa: E402
+from diagrams.utils.graph import get_node_longest_chain  # noqa: E402
+from generators import GENERATORS  # noqa: E402
+
+"""
+Pipeline benchmarks on synthetic documents.
+
+    git checkout main && python benchmarks/run.py --save /tmp/baseline.json
+    git checkout my-branch && python benchmarks/run.py --baseline /tmp/baseline.json
+
+Every stage of parse -> render is timed, best of --repeat runs, for each
+generator and size, then run once more under tracemalloc for its peak
+memory. With --baseline, the run fails when a stage got slower, or uses
+more memory, than the baseline by more than --threshold. Timings depend on
+the machine, so save the baseline on the one that runs the comparison.
+"""
+
+SIZES = (10, 100)
+# The recursive chain search is exponential on cyclic graphs
+LEGACY_CHAIN_MAX_NODES = 12
+# Stages faster than this are mostly timer noise, they are not gated
+MIN_SECONDS = 0.001
+
+
+def pipeline(text: str, legacy_chain: bool = False) -> List[tuple]:
+    """(stage, function) pairs, each stage working on the previous results"""
+    state: dict = {}
+
+    def parse():
+        state['builder'] = GraphBuilder().feed(iter_events(text.split('\n')))
+
+    def to_graph():
+        state['graph'] = state['builder'].graph()
+
+    def chains():
+        graph = state['graph']
+        graph._chains = None  # Not cached across repeats
+        graph.node_chain(next(iter(graph.nodes)).id)
+
+    def longest_chain():
+        graph = state['graph']
+        get_node_longest_chain(graph, next(iter(graph.nodes)), [])
+
+    def layout():
+        state['renderer'] = graph_renderer = renderer.GraphRenderer(state['graph'])
+        graph_renderer.place_nodes()
+
+    def intersections():
+        # Where each link leaves its source and enters its destination
+        shapes = state['renderer'].shapes
+        for node in state['graph'].nodes:
+            for adj in node.adjacents:
+                shapes[node.id].intersection_from(*shapes[adj].center)
+                shapes[adj].intersection_from(*shapes[node.id].center)
+
+    def compose():
+        state['renderer'].compose()
+
+    def draw():
+        graph_renderer = state['renderer']
+        graph_renderer.img = Image.new('RGB', (graph_renderer.width, graph_renderer.height))
+        PillowBackend(graph_renderer.img).execute(graph_renderer.display_list)
+
+    def encode():
+        state['renderer'].img.save(io.BytesIO(), 'PNG')
+
+    stages = [('parse', parse), ('to_graph', to_graph), ('chains', chains)]
+    if legacy_chain:
+        stages.append(('legacy_chain', longest_chain))
+    stages += [
+        ('layout', layout), ('intersections', intersections),
+        ('compose', compose), ('draw', draw), ('encode', encode),
+    ]
+    return stages
+
+
+def measure(text: str, repeat: int) -> Dict[str, dict]:
+    nodes = len(GraphBuilder().feed(iter_events(text.split('\n'))).graph().nodes)
+    stages = pipeline(text, legacy_chain=nodes <= LEGACY_CHAIN_MAX_NODES)
+
+    results = {name: {'seconds': float('inf')} for name, _ in stages}
+    for _ in range(repeat):
+        for name, stage in stages:
+            start = time.perf_counter()
+            stage()
+            results[name]['seconds'] = min(results[name]['seconds'], time.perf_counter() - start)
+
+    # Peak of the memory allocated by each stage, traced apart from timings
+    for name, stage in stages:
+        tracemalloc.start()
+        stage()
+        results[name]['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return results
+
+
+def run(generators: List[str], sizes: List[int], repeat: int, seed: int,
+        progress: Optional[Callable] = None) -> dict:
+    results = {}
+    for name in generators:
+        for size in sizes:
+            text = GENERATORS[name](size, seed)
+            for stage, result in measure(text, repeat).items():
+                key = f'{name}/{size}/{stage}'
+                results[key] = result
+                if progress:
+                    progress(key, result)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Stages slower, or using more memory, than baseline by over threshold"""
+    found = []
+    for key, base in baseline['results'].items():
+        current = results['results'].get(key)
+        if current is None:
+            continue
+        seconds, base_seconds = current['seconds'], base['seconds']
+        if seconds > MIN_SECONDS and seconds > base_seconds * (1 + threshold):
+            found.append(f'{key}: {base_seconds * 1000:.2f} ms -> {seconds * 1000:.2f} ms')
+        peak, base_peak = current.get('peak_bytes'), base.get('peak_bytes')
+        if peak and base_peak and peak > base_peak * (1 + threshold):
+            found.append(f'{key}: {base_peak} B -> {peak} B peak memory')
+    return found
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Benchmark the diagram pipeline')
+    arg_parser.add_argument('-g', '--generator', action='append', choices=sorted(GENERATORS))
+    arg_parser.add_argument('-s', '--size', action='append', type=int)
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--font', default=renderer.RENDERFONT)
+    arg_parser.add_argument('--save', help='write the results as JSON')
+    arg_parser.add_argument('--baseline', help='JSON results to compare with')
+    arg_parser.add_argument('--threshold', type=float, default=0.25,
+                            help='allowed slowdown, as a fraction of the baseline')
+    args = arg_parser.parse_args(argv)
+
+    renderer.RENDERFONT = args.font
+
+    def progress(key, result):
+        print(f'{key:40} {result["seconds"] * 1000:10.2f} ms {result["peak_bytes"]:12} B')
+
+    results = run(
+        args.generator or list(GENERATORS), args.size or list(SIZES),
+        args.repeat, args.seed, progress,
+    )
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.threshold)
+        for regression in found:
+            print(f'REGRESSION {regression}')
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
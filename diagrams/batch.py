@@ -0,0 +1,158 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import renderer
+from .cache import RenderCache
+from .fonts import get_font
+from .parser import parse
+
+"""
+Batch rendering of many DSL files across a process pool.
+
+    python -m diagrams.batch examples/ 'more/**/*.dsl' -o build/diagrams -j 4
+
+Directories are searched recursively for *.dsl files, other arguments are
+expanded as globs. A file that fails to parse or render, whatever the error,
+is reported and the batch goes on with the rest. With --cache, unchanged files are copied from
+the render cache instead of being drawn again.
+"""
+
+FORMATS = ('png', 'svg')
+
+cache: Optional[RenderCache] = None  # Per worker, set by warm_worker
+
+
+class Result(NamedTuple):
+    path: str
+    output: Optional[str]
+    error: Optional[str]
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def find_inputs(patterns: Sequence[str]) -> List[Tuple[str, str]]:
+    """(path, name) of every DSL file matched, name being the path relative
+    to the directory it was found in, or the file name for globs"""
+    found: Dict[str, str] = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for path in glob.glob(os.path.join(pattern, '**', '*.dsl'), recursive=True):
+                found.setdefault(path, os.path.relpath(path, pattern))
+        else:
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    found.setdefault(path, os.path.basename(path))
+    return sorted(found.items())
+
+
+def output_path(path: str, name: str, out_dir: Optional[str], format: str) -> str:
+    """Output next to the input, or under out_dir keeping the relative name"""
+    base = os.path.join(out_dir, name) if out_dir else path
+    return os.path.splitext(base)[0] + '.' + format
+
+
+def warm_worker(font: str, cache_dir: Optional[str] = None):
+    """Pool initializer: set the render font and load it once per worker"""
+    global cache
+    renderer.RENDERFONT = font
+    cache = RenderCache(cache_dir) if cache_dir else None
+    try:
+        get_font(font)
+    except OSError:
+        pass  # Reported per file by render_file
+
+
+def render_file(path: str, output: str, format: str = 'png') -> Result:
+    start = time.perf_counter()
+    try:
+        with open(path) as f:
+            text = f.read()
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        if cache is not None:
+            data = cache.render(text, format)
+            with open(output, 'wb') as f:
+                f.write(data)
+            return Result(path, output, None, time.perf_counter() - start)
+
+        graph_renderer = renderer.GraphRenderer(parse(text))
+        if format == 'svg':
+            with open(output, 'w') as f:
+                graph_renderer.render_svg(f)
+        else:
+            graph_renderer.render().save(output)
+    except Exception as e:  # One bad document must not stop the batch
+        return Result(path, None, f'{type(e).__name__}: {e}', time.perf_counter() - start)
+    return Result(path, output, None, time.perf_counter() - start)
+
+
+def render_batch(
+    inputs: Sequence[Tuple[str, str]],
+    out_dir: Optional[str] = None,
+    format: str = 'png',
+    workers: Optional[int] = None,
+    font: str = renderer.RENDERFONT,
+    cache_dir: Optional[str] = None,
+) -> Iterator[Result]:
+    """Render (path, name) inputs, yielding results as files complete"""
+    jobs = [(path, output_path(path, name, out_dir, format), format) for path, name in inputs]
+    if workers == 1 or len(jobs) <= 1:
+        warm_worker(font, cache_dir)
+        for job in jobs:
+            yield render_file(*job)
+        return
+
+    pool = ProcessPoolExecutor(workers, initializer=warm_worker, initargs=(font, cache_dir))
+    with pool as executor:
+        futures = [executor.submit(render_file, *job) for job in jobs]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # In case the caller stops early
+            for future in futures:
+                future.cancel()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Render DSL files in parallel')
+    arg_parser.add_argument('inputs', nargs='+', help='directories, files or globs')
+    arg_parser.add_argument('-o', '--out-dir', help='defaults to next to each input')
+    arg_parser.add_argument('-f', '--format', choices=FORMATS, default='png')
+    arg_parser.add_argument('-j', '--workers', type=int, help='defaults to the CPU count')
+    arg_parser.add_argument('--font', default=renderer.RENDERFONT)
+    arg_parser.add_argument('--cache', help='render cache directory')
+    args = arg_parser.parse_args(argv)
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        print('No DSL files found', file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    failed = 0
+    for result in render_batch(
+        inputs, args.out_dir, args.format, args.workers, args.font, args.cache
+    ):
+        ms = result.seconds * 1000
+        if result.ok:
+            print(f'OK    {result.path} -> {result.output} ({ms:.1f} ms)')
+        else:
+            failed += 1
+            print(f'FAIL  {result.path}: {result.error} ({ms:.1f} ms)')
+
+    elapsed = time.perf_counter() - start
+    print(f'{len(inputs) - failed} rendered, {failed} failed in {elapsed:.2f} s')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import instrument, renderer
+from .fonts import get_font
+from .parser import parse
+
+"""
+Content addressed on-disk cache of rendered diagrams.
+
+Entries are named by a digest of everything the output depends on: the DSL
+text, the render options, the font files and the renderer version. A changed
+input is a new key, so entries never need invalidating, only evicting.
+
+Several processes can share a cache directory. Entries are written to a
+temporary file and renamed into place, so readers see whole entries or
+nothing, and an entry evicted by another process is just a miss.
+"""
+
+# Bump whenever a change to the drawing code changes the output
+RENDER_VERSION = 2
+
+
+def render_bytes(text: str, format: str = 'png') -> bytes:
+    """Parse and render a DSL document, encoded as PNG or SVG"""
+    graph_renderer = renderer.GraphRenderer(parse(text))
+    if format == 'svg':
+        stream = io.StringIO()
+        graph_renderer.render_svg(stream)
+        return stream.getvalue().encode('utf-8')
+    img = graph_renderer.render()
+    output = io.BytesIO()
+    with instrument.stage('encode'):
+        img.save(output, format.upper())
+    return output.getvalue()
+
+
+class RenderCache:
+    """Rendered outputs keyed by content digest, under `directory`.
+
+    Least recently used entries are evicted once the entries take more than
+    `max_bytes`. Hits touch the entry's modification time, which is what
+    recency is measured by, so it is shared between processes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size: Optional[int] = None  # Known lazily, from a scan
+        self._font_digests: Dict[tuple, str] = {}
+
+    def font_digest(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in self._font_digests:
+            with open(path, 'rb') as f:
+                self._font_digests[key] = hashlib.sha256(f.read()).hexdigest()
+        return self._font_digests[key]
+
+    def key(self, text: str, options: dict, font_files: Iterable[str] = ()) -> str:
+        import PIL
+
+        digest = hashlib.sha256()
+        for part in (
+            f'{RENDER_VERSION} {PIL.__version__}',
+            json.dumps(options, sort_keys=True),
+            *(self.font_digest(path) for path in font_files),
+            text,
+        ):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted by another process since it was read
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self.entries())
+        else:
+            self._size += len(data) - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """(path, size, mtime) of every entry"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Evicted meanwhile
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until under max_bytes"""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        size = sum(size for _, size, _ in entries)
+        for path, entry_size, _ in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass  # Another process got there first
+            size -= entry_size
+        self._size = size
+
+    def render(self, text: str, format: str = 'png') -> bytes:
+        """Rendered output of a DSL document, drawn only on a cache miss"""
+        font = renderer.RENDERFONT
+        key = self.key(text, {'format': format, 'font': font}, [get_font(font).path])
+        data = self.get(key)
+        if data is None:
+            data = render_bytes(text, format)
+            self.put(key, data)
+        return data
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
@@ -0,0 +1,143 @@
+import math
+
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+"""
+Shapes are compiled into a display list of flat draw commands, grouped by
+kind, which backends execute without walking the shape tree again.
+"""
+
+Point = Tuple[float, float]
+
+
+class LineCommand(NamedTuple):
+    start: Point
+    end: Point
+    width: int = 1
+
+
+class ArcCommand(NamedTuple):
+    box: Tuple[float, float, float, float]  # Bounding box of the circle
+    start: float  # Degrees, clockwise as the y axis points down
+    end: float
+
+
+class RectangleCommand(NamedTuple):
+    top_left: Point
+    bottom_right: Point
+
+
+class TextCommand(NamedTuple):
+    position: Point  # Top left
+    text: str
+    font: str
+    size: int = 10
+
+
+COMMAND_TYPES = (RectangleCommand, LineCommand, ArcCommand, TextCommand)
+
+
+def compile_line(obj):
+    return LineCommand(obj.start, obj.end, obj.width or 1)
+
+
+def compile_arc(obj):
+    (x, y), r = obj.center, obj.radius
+    return ArcCommand(
+        (x - r, y - r, x + r, y + r),
+        math.degrees(-obj.end),
+        math.degrees(-obj.start),
+    )
+
+
+def compile_rectangle(obj):
+    return RectangleCommand(obj.top_left, obj.bottom_right)
+
+
+def compile_text(obj):
+    return TextCommand(obj.position, obj.text, obj.font)
+
+
+COMPILERS = {
+    'line': compile_line,
+    'arc': compile_arc,
+    'rectangle': compile_rectangle,
+    'text': compile_text,
+}
+
+
+def compile_object(obj) -> Iterator:
+    """Draw commands of a shape, flattening its primitives depth first.
+    Shapes with a commands() method, e.g. from a template, provide their own"""
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        compiler = COMPILERS.get(obj.type)
+        if compiler is not None:
+            yield compiler(obj)
+        elif hasattr(obj, 'commands'):
+            yield from obj.commands()
+        else:
+            stack.extend(reversed(obj.primitives))
+
+
+class DisplayList:
+    """Draw commands grouped by their type, in insertion order per group"""
+
+    def __init__(self, commands: Iterable = ()):
+        self.groups: Dict[type, List] = {kind: [] for kind in COMMAND_TYPES}
+        self.extend(commands)
+
+    def add(self, command):
+        self.groups[type(command)].append(command)
+
+    def extend(self, commands: Iterable):
+        groups = self.groups
+        for command in commands:
+            groups[type(command)].append(command)
+
+    def add_object(self, obj):
+        self.extend(compile_object(obj))
+
+    def __iter__(self) -> Iterator:
+        for commands in self.groups.values():
+            yield from commands
+
+    def __len__(self) -> int:
+        return sum(len(commands) for commands in self.groups.values())
+
+    def scaled(self, factor: float) -> 'DisplayList':
+        """Copy with every coordinate, and font size, multiplied by factor"""
+        return self.transformed(factor, (0, 0))
+
+    def translated(self, dx: float, dy: float) -> 'DisplayList':
+        return self.transformed(1, (dx, dy))
+
+    def transformed(self, factor: float, offset: Point) -> 'DisplayList':
+        """Copy with every point p moved to p * factor + offset"""
+        dx, dy = offset
+
+        def move(p):
+            return p[0] * factor + dx, p[1] * factor + dy
+
+        groups = self.groups
+        transformed = DisplayList()
+        transformed.groups = {
+            RectangleCommand: [
+                RectangleCommand(move(c.top_left), move(c.bottom_right))
+                for c in groups[RectangleCommand]
+            ],
+            LineCommand: [
+                LineCommand(move(c.start), move(c.end), c.width)
+                for c in groups[LineCommand]
+            ],
+            ArcCommand: [
+                ArcCommand((*move(c.box[:2]), *move(c.box[2:])), c.start, c.end)
+                for c in groups[ArcCommand]
+            ],
+            TextCommand: [
+                TextCommand(move(c.position), c.text, c.font, max(1, round(c.size * factor)))
+                for c in groups[TextCommand]
+            ],
+        }
+        return transformed
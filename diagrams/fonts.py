@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+DEFAULT_SIZE = 10  # Same as ImageFont.truetype's default
+
+
+def truetype(name: str, size: int = DEFAULT_SIZE):
+    # Pillow is only imported once a font is needed, parsing never loads it
+    from PIL import ImageFont
+    return ImageFont.truetype(name, size)
+
+
+class FontRegistry:
+    """Process wide cache of loaded font faces, keyed by (name, size).
+
+    Least recently used faces are evicted once `maxsize` faces are loaded.
+    """
+
+    def __init__(self, maxsize: int = 32, loader=truetype):
+        self.maxsize = maxsize
+        self.loader = loader
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._fonts: OrderedDict = OrderedDict()
+
+    def get(self, name: str, size: int = DEFAULT_SIZE):
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is not None:
+            self.hits += 1
+            self._fonts.move_to_end(key)
+            return font
+
+        self.misses += 1
+        font = self.loader(name, size)
+        self._fonts[key] = font
+        if len(self._fonts) > self.maxsize:
+            self._fonts.popitem(last=False)
+            self.evictions += 1
+        return font
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'loaded': len(self._fonts),
+        }
+
+    def clear(self):
+        self._fonts.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._fonts)
+
+    def __contains__(self, key):
+        return key in self._fonts
+
+
+registry = FontRegistry()
+
+
+def get_font(name: str, size: int = DEFAULT_SIZE):
+    """Return the font face from the process wide registry"""
+    return registry.get(name, size)
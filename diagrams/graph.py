@@ -1,16 +1,18 @@
-from typing import List, Dict
+from array import array
+from typing import List, Dict, Optional, Sequence, Tuple
 
 
 class Node:
-    __slots__ = 'id', 'varname', 'value', 'type', 'adjacents'
+    __slots__ = 'id', 'varname', 'value', 'type', 'adjacents', 'symbol'
     count = 0
 
-    def __init__(self, varname: str, value: str, type: str):
+    def __init__(self, varname: str, value: str, type: str, symbol: Optional[int] = None):
         self.id = Node.count
         Node.count += 1
         self.varname = varname
         self.value = value
         self.type = type
+        self.symbol = symbol  # Interned id of varname
         self.adjacents: List[int] = []
 
     def __str__(self):
@@ -18,11 +20,16 @@ class Node:
 
 
 class Graph:
-    __slots__ = 'nodes', 'id_nodes'
+    __slots__ = 'nodes', 'id_nodes', 'symbols', 'symbol_nodes', '_chains'
 
-    def __init__(self, nodes: List[Node]):
+    def __init__(self, nodes: List[Node], symbols=None):
         self.nodes = nodes
         self.id_nodes: Dict[int, Node] = {x.id: x for x in nodes}
+        self.symbols = symbols  # SymbolTable the node symbols belong to
+        self.symbol_nodes: Dict[Tuple[str, int], Node] = {
+            (x.type, x.symbol): x for x in nodes if x.symbol is not None
+        }
+        self._chains = None
 
     def __str__(self) -> str:
         node_info = 'NODES\n'
@@ -34,7 +41,137 @@ class Graph:
 
     def node_chain(self, node_id: int) -> List[Node]:
         """Return chain of nodes from given node"""
-        pass
+        return [self.get_node(x) for x in self.chains.chain(node_id)]
+
+    @property
+    def chains(self):
+        """Chain analysis, computed on first use. Graphs are not expected to
+        change once built"""
+        if self._chains is None:
+            from .utils.chains import ChainAnalysis
+            self._chains = ChainAnalysis(self)
+        return self._chains
 
     def get_node(self, node_id: int) -> Node:
         return self.id_nodes[node_id]
+
+    def get_symbol_node(self, type: str, symbol: int) -> Node:
+        return self.symbol_nodes[(type, symbol)]
+
+
+class CompactNode:
+    """Read only view of a node in a CompactGraph"""
+    __slots__ = 'graph', 'id'
+
+    def __init__(self, graph: 'CompactGraph', id: int):
+        self.graph = graph
+        self.id = id
+
+    @property
+    def varname(self) -> str:
+        return self.graph.symbols.symbol(self.graph.node_symbols[self.id])
+
+    @property
+    def symbol(self) -> int:
+        return self.graph.node_symbols[self.id]
+
+    @property
+    def value(self) -> str:
+        return self.graph.values[self.id]
+
+    @property
+    def type(self) -> str:
+        return self.graph.types[self.id]
+
+    @property
+    def adjacents(self) -> memoryview:
+        return self.graph.neighbours(self.id)
+
+    def __str__(self):
+        return f'{self.id}: {self.varname} -> {self.value}, {self.type}'
+
+
+class CompactNodes(Sequence):
+    __slots__ = 'graph',
+
+    def __init__(self, graph: 'CompactGraph'):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return CompactNode(self.graph, index)
+
+
+class CompactGraph:
+    """Array backed (CSR) graph. Node ids are 0..n-1 and the adjacents of node
+    i are targets[offsets[i]:offsets[i + 1]].
+
+    Labels, types and symbols are kept in parallel arrays; Node like views are
+    only created on access.
+    """
+    __slots__ = 'offsets', 'targets', '_targets_view', 'values', 'types', \
+        'node_symbols', 'symbols', '_chains'
+
+    def __init__(self, offsets: array, targets: array, values: List[str],
+                 types: str, node_symbols: array, symbols=None):
+        self.offsets = offsets
+        self.targets = targets
+        self._targets_view = memoryview(targets)
+        self.values = values
+        self.types = types  # One enclosure character per node
+        self.node_symbols = node_symbols
+        self.symbols = symbols
+        self._chains = None
+
+    @classmethod
+    def from_links(cls, vars: dict, links: dict, symbols) -> 'CompactGraph':
+        """Build from a link table keyed by (enclosure, symbol id) endpoints,
+        numbering nodes in the same order as parser.to_graph"""
+        index: Dict[Tuple[str, int], int] = {}
+        for source, dests in links.items():
+            index.setdefault(source, len(index))
+            for dest in dests:
+                index.setdefault(dest, len(index))
+
+        offsets = array('l', [0])
+        targets = array('l')
+        for endpoint in index:
+            targets.extend(index[dest] for dest in links.get(endpoint, ()))
+            offsets.append(len(targets))
+
+        values = [vars[symbol] for _, symbol in index]
+        types = ''.join(type for type, _ in index)
+        node_symbols = array('l', (symbol for _, symbol in index))
+        return cls(offsets, targets, values, types, node_symbols, symbols)
+
+    @property
+    def nodes(self) -> CompactNodes:
+        return CompactNodes(self)
+
+    def neighbours(self, node_id: int) -> memoryview:
+        """Adjacent node ids, without copying"""
+        return self._targets_view[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def get_node(self, node_id: int) -> CompactNode:
+        if not 0 <= node_id < len(self.values):
+            raise KeyError(node_id)
+        return CompactNode(self, node_id)
+
+    node_chain = Graph.node_chain
+    chains = Graph.chains
+
+    def __str__(self) -> str:
+        node_info = 'NODES\n'
+        links_info = ''
+        for node in self.nodes:
+            node_info += str(node) + '\n'
+            links_info += f'{node.id} -> {node.adjacents.tolist()}\n'
+        return f'{node_info}\nLINKS\n{links_info}'
@@ -0,0 +1,139 @@
+import sys
+import time
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+"""
+Per stage timings and counters of the pipeline.
+
+Instrumented code calls stage() and count(). They do nothing until a
+recorder is enabled, then forward to it:
+
+    with instrument.recording() as stats:
+        renderer.render()
+    print(stats.report())
+
+A recorder is any object with stage(name, seconds) and count(name, n)
+methods, so timings can as well go to a log or a metrics client.
+"""
+
+recorder = None
+
+
+class Stats:
+    """Recorder accumulating wall time per stage and counters.
+
+    Fonts loaded and texts measured are read from the font registry and the
+    text metrics cache, as differences between start() and stop(). They are
+    not imported here, so that parsing alone never loads Pillow.
+    """
+
+    def __init__(self):
+        self.times: Dict[str, float] = defaultdict(float)
+        self.calls: Counter = Counter()
+        self.counters: Counter = Counter()
+        self._caches: Dict[str, int] = {}
+
+    def stage(self, name: str, seconds: float):
+        self.times[name] += seconds
+        self.calls[name] += 1
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def cache_misses(self) -> Dict[str, int]:
+        fonts = sys.modules.get('diagrams.fonts')
+        text_metrics = sys.modules.get('diagrams.text_metrics')
+        return {
+            'fonts_loaded': fonts.registry.misses if fonts else 0,
+            'texts_measured': text_metrics.metrics.misses if text_metrics else 0,
+        }
+
+    def start(self):
+        self._caches = self.cache_misses()
+
+    def stop(self):
+        for name, misses in self.cache_misses().items():
+            self.counters[name] += misses - self._caches.get(name, 0)
+
+    def as_dict(self) -> dict:
+        return {
+            'stages': {
+                name: {'seconds': seconds, 'calls': self.calls[name]}
+                for name, seconds in self.times.items()
+            },
+            'counters': dict(self.counters),
+        }
+
+    def report(self) -> str:
+        lines = [
+            f'{name:20} {seconds * 1000:10.2f} ms {self.calls[name]:6}x'
+            for name, seconds in self.times.items()
+        ]
+        lines += [f'{name:20} {n:10}' for name, n in sorted(self.counters.items())]
+        return '\n'.join(lines)
+
+
+class _Stage:
+    __slots__ = 'name', 'recorder', 'start'
+
+    def __init__(self, name, recorder):
+        self.name = name
+        self.recorder = recorder
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.recorder.stage(self.name, time.perf_counter() - self.start)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """Context manager timing the block as stage `name`, when recording"""
+    if recorder is None:
+        return NO_STAGE
+    return _Stage(name, recorder)
+
+
+def count(name: str, n: int = 1):
+    if recorder is not None:
+        recorder.count(name, n)
+
+
+def enable(new_recorder=None):
+    """Start recording, to a new Stats unless a recorder is given"""
+    global recorder
+    recorder = new_recorder if new_recorder is not None else Stats()
+    if hasattr(recorder, 'start'):
+        recorder.start()
+    return recorder
+
+
+def disable():
+    global recorder
+    if recorder is not None and hasattr(recorder, 'stop'):
+        recorder.stop()
+    recorder = None
+
+
+@contextmanager
+def recording(new_recorder=None):
+    try:
+        yield enable(new_recorder)
+    finally:
+        disable()
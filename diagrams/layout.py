@@ -0,0 +1,242 @@
+import bisect
+
+from typing import Dict, List, NamedTuple, Tuple
+
+"""
+Layered (Sugiyama style) layout. Nodes are assigned to layers top to bottom
+along the edges, ordered within their layers to reduce crossings, and then
+given coordinates. Every stage is linear in the size of the graph, apart from
+sorting the layers.
+"""
+
+Point = Tuple[float, float]
+Size = Tuple[float, float]
+Box = Tuple[float, float, float, float]
+
+
+class Layout(NamedTuple):
+    centers: Dict[int, Point]  # Node id to center of its shape
+    layers: List[List[int]]  # Node ids of each layer, in order
+    width: float
+    height: float
+
+
+def acyclic_adjacents(adjacents: List[List[int]]) -> List[List[int]]:
+    """Copy of adjacents with back edges, found by DFS, reversed and self
+    loops dropped"""
+    count = len(adjacents)
+    result: List[List[int]] = [[] for _ in range(count)]
+    state = [0] * count  # 0: unvisited, 1: on stack, 2: done
+
+    for root in range(count):
+        if state[root]:
+            continue
+        state[root] = 1
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            edges = adjacents[v]
+            while i < len(edges):
+                w = edges[i]
+                i += 1
+                if w == v:
+                    continue
+                if state[w] == 1:  # Back edge
+                    result[w].append(v)
+                    continue
+                result[v].append(w)
+                if state[w] == 0:
+                    state[w] = 1
+                    work.append((v, i))
+                    work.append((w, 0))
+                    break
+            else:
+                state[v] = 2
+    return result
+
+
+def assign_layers(adjacents: List[List[int]]) -> List[int]:
+    """Longest path layering of an acyclic graph, sources on layer 0"""
+    count = len(adjacents)
+    indegree = [0] * count
+    for edges in adjacents:
+        for w in edges:
+            indegree[w] += 1
+
+    layer = [0] * count
+    queue = [v for v in range(count) if indegree[v] == 0]
+    for v in queue:  # Grows while iterating, as in a BFS
+        for w in adjacents[v]:
+            layer[w] = max(layer[w], layer[v] + 1)
+            indegree[w] -= 1
+            if indegree[w] == 0:
+                queue.append(w)
+    return layer
+
+
+def order_layers(layers: List[List[int]], adjacents: List[List[int]], sweeps: int) -> None:
+    """Barycenter heuristic, alternating down and up sweeps. Each node is moved
+    towards the mean position of its neighbours in the layers already swept"""
+    predecessors: List[List[int]] = [[] for _ in adjacents]
+    for v, edges in enumerate(adjacents):
+        for w in edges:
+            predecessors[w].append(v)
+
+    position = [0] * len(adjacents)
+    for nodes in layers:
+        for i, v in enumerate(nodes):
+            position[v] = i
+
+    def sweep(layer_indices, neighbours):
+        for index in layer_indices:
+            nodes = layers[index]
+            barycenters = {}
+            for v in nodes:
+                adjacent = neighbours[v]
+                if adjacent:
+                    barycenters[v] = sum(position[w] for w in adjacent) / len(adjacent)
+                else:
+                    barycenters[v] = position[v]  # Stays where it is
+            nodes.sort(key=barycenters.__getitem__)
+            for i, v in enumerate(nodes):
+                position[v] = i
+
+    for i in range(sweeps):
+        if i % 2 == 0:
+            sweep(range(1, len(layers)), predecessors)
+        else:
+            sweep(range(len(layers) - 2, -1, -1), adjacents)
+
+
+def layered_layout(
+    graph,
+    sizes: Dict[int, Size],
+    h_gap: float = 40,
+    v_gap: float = 60,
+    margin: float = 20,
+    sweeps: int = 4,
+) -> Layout:
+    """Lay out graph nodes, given the size of the shape of each node id"""
+    ids = [node.id for node in graph.nodes]
+    position = {id: i for i, id in enumerate(ids)}
+    adjacents = [[position[adj] for adj in node.adjacents] for node in graph.nodes]
+
+    acyclic = acyclic_adjacents(adjacents)
+    layer_of = assign_layers(acyclic)
+
+    layers: List[List[int]] = [[] for _ in range(max(layer_of, default=-1) + 1)]
+    for v, layer in enumerate(layer_of):
+        layers[layer].append(v)
+    order_layers(layers, acyclic, sweeps)
+
+    # Coordinates: every layer is centered horizontally on the canvas
+    node_sizes = [sizes[id] for id in ids]
+    layer_widths = [
+        sum(node_sizes[v][0] for v in nodes) + h_gap * (len(nodes) - 1)
+        for nodes in layers
+    ]
+    content_width = max(layer_widths, default=0)
+
+    centers: Dict[int, Point] = {}
+    y = margin
+    for nodes, layer_width in zip(layers, layer_widths):
+        layer_height = max(node_sizes[v][1] for v in nodes)
+        x = margin + (content_width - layer_width) / 2
+        for v in nodes:
+            w, _ = node_sizes[v]
+            centers[ids[v]] = (x + w / 2, y + layer_height / 2)
+            x += w + h_gap
+        y += layer_height + v_gap
+
+    height = y - (v_gap if layers else 0) + margin
+    return Layout(
+        centers,
+        [[ids[v] for v in nodes] for nodes in layers],
+        content_width + 2 * margin,
+        height,
+    )
+
+
+class Channels:
+    """Free space a layered layout leaves between its layers, and between the
+    nodes of each layer. Edges routed through it miss every node"""
+
+    def __init__(self, layout: Layout, boxes: Dict[int, Box], clearance: float = 10):
+        self.boxes = boxes
+        self.clearance = clearance
+        self.layer_of: Dict[int, int] = {}
+        self.bands: List[Tuple[float, float]] = []  # Top and bottom of each layer
+        self.spans: List[List[Tuple[float, float]]] = []  # Sorted x extents of its nodes
+        self.starts: List[List[float]] = []
+        for index, ids in enumerate(layout.layers):
+            for id in ids:
+                self.layer_of[id] = index
+            self.bands.append((min(boxes[id][1] for id in ids), max(boxes[id][3] for id in ids)))
+            spans = sorted((boxes[id][0], boxes[id][2]) for id in ids)
+            self.spans.append(spans)
+            self.starts.append([x0 for x0, _ in spans])
+        self.left = min((box[0] for box in boxes.values()), default=0)
+        self.right = max((box[2] for box in boxes.values()), default=0)
+
+    def gap_y(self, layer: int) -> float:
+        """Middle of the gap above the layer, below the last one for the
+        number of layers"""
+        if layer == 0:
+            return self.bands[0][0] - self.clearance
+        if layer == len(self.bands):
+            return self.bands[-1][1] + self.clearance
+        return (self.bands[layer - 1][1] + self.bands[layer][0]) / 2
+
+    def free_x(self, layer: int, x: float) -> float:
+        """x nearest to the given one at which a vertical line crosses the
+        layer clear of its nodes, in the middle of gaps between them"""
+        spans, c = self.spans[layer], self.clearance
+        i = bisect.bisect_left(self.starts[layer], x + c) - 1
+        if i < 0 or x >= spans[i][1] + c:
+            return x
+        x0, x1 = spans[i]
+        left = x0 - c if i == 0 else (spans[i - 1][1] + x0) / 2
+        right = x1 + c if i == len(spans) - 1 else (x1 + spans[i + 1][0]) / 2
+        return left if x - left <= right - x else right
+
+    def region(self, source: int, dest: int) -> Box:
+        """Box of the nodes whose placement the route of an edge depends on,
+        those of the layers it spans and of the one below"""
+        a, b = self.layer_of[source], self.layer_of[dest]
+        top = self.bands[min(a, b)][0]
+        bottom = self.bands[min(max(a, b) + 1, len(self.bands) - 1)][1]
+        return self.left, top, self.right, bottom
+
+    def waypoints(self, source: int, dest: int) -> List[Point]:
+        """Bends of an edge between two node ids: out of the source into the
+        gap next to its layer, through the layers in between, then into the
+        dest from the gap next to its layer"""
+        a, b = self.layer_of[source], self.layer_of[dest]
+        if a < b:
+            gaps = list(range(a + 1, b + 1))
+        elif a > b:
+            gaps = list(range(a, b, -1))
+        else:  # Along the gap below the layer
+            gaps = [a + 1]
+        xs = (self.boxes[source][0] + self.boxes[source][2]) / 2
+        xd = (self.boxes[dest][0] + self.boxes[dest][2]) / 2
+
+        # Straight down or up, stepping aside only for the nodes in the way
+        x = xs
+        points = [(x, self.gap_y(gaps[0]))]
+        for gap, next_gap in zip(gaps, gaps[1:]):
+            x = self.free_x(min(gap, next_gap), x)
+            points += [(x, self.gap_y(gap)), (x, self.gap_y(next_gap))]
+        points.append((xd, self.gap_y(gaps[-1])))
+
+        # Drop repeated points and the middle of straight runs
+        bends: List[Point] = []
+        for point in points:
+            if bends and point == bends[-1]:
+                continue
+            if len(bends) > 1 and (bends[-2][0] == bends[-1][0] == point[0] or
+                                   bends[-2][1] == bends[-1][1] == point[1]):
+                bends[-1] = point
+            else:
+                bends.append(point)
+        return bends
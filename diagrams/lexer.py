@@ -0,0 +1,82 @@
+import re
+
+from typing import List, NamedTuple
+
+"""
+Single pass tokenizer for DSL lines. The grammar in `parser` works on the
+tokens so that a line is never scanned more than once.
+"""
+
+IDENT = 'ident'
+STRING = 'string'
+BRACE = 'brace'
+DEFINE = 'define'
+LINK = 'link'
+UNKNOWN = 'unknown'
+EOF = 'eof'
+
+BRACES = '[]()<>/'
+LINKS = ('->', '<-')
+
+IDENT_RE = re.compile('[A-Za-z]+')
+
+
+class Token(NamedTuple):
+    kind: str
+    value: str
+    col: int  # zero based column of the first character
+
+    @property
+    def end(self) -> int:
+        return self.col + len(self.value)
+
+
+def tokenize(line: str) -> List[Token]:
+    """Split a line into tokens, always terminated by an EOF token.
+
+    Comments are dropped. Characters that can't start a token become UNKNOWN
+    tokens, leaving it to the grammar to report them in context.
+    """
+    tokens: List[Token] = []
+    length = len(line)
+    pos = 0
+    while pos < length:
+        char = line[pos]
+        if char == ' ' or char == '\t':
+            pos += 1
+        elif char == '#':
+            break
+        elif char == '"':
+            close = line.find('"', pos + 1)
+            if close == -1:  # Unterminated string
+                tokens.append(Token(UNKNOWN, line[pos:], pos))
+                break
+            tokens.append(Token(STRING, line[pos:close + 1], pos))
+            pos = close + 1
+        elif line.startswith(LINKS, pos):
+            tokens.append(Token(LINK, line[pos:pos + 2], pos))
+            pos += 2
+        elif char in BRACES:
+            tokens.append(Token(BRACE, char, pos))
+            pos += 1
+        elif line.startswith(':=', pos):
+            tokens.append(Token(DEFINE, ':=', pos))
+            pos += 2
+        else:
+            match = IDENT_RE.match(line, pos)
+            if match is None:
+                tokens.append(Token(UNKNOWN, char, pos))
+                pos += 1
+            else:
+                tokens.append(Token(IDENT, match.group(), pos))
+                pos = match.end()
+
+    # EOF sits right after the last token, so trailing blanks and comments
+    # don't shift the reported columns
+    tokens.append(Token(EOF, '', tokens[-1].end if tokens else 0))
+    return tokens
+
+
+def string_value(token: Token) -> str:
+    """Value of a STRING token without the quotes"""
+    return token.value[1:-1]
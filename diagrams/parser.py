@@ -1,11 +1,15 @@
-import string
-import re
-
-from typing import cast, List
-
-from utils.strings import string_hash
-from exceptions import SyntaxError, SemanticError
-from graph import Graph, Node
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+from typing import cast, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .lexer import (
+    Token, tokenize, string_value,
+    IDENT, STRING, BRACE, DEFINE, LINK, EOF,
+)
+from .utils.strings import SymbolTable
+from .exceptions import SyntaxError, SemanticError
+from . import instrument
+from .graph import CompactGraph, Graph, Node
 
 from collections import OrderedDict
 """
@@ -21,255 +25,551 @@ BRACES_ENDS = {
 }
 
 
-def parse_char(char: str, line: str, index: int):
-    pos = strip_empty(line, index)
-    if pos >= len(line) or line[pos] != char:
-        return None, pos, ''
-
-
-def strip_empty(line: str, index: int = 0):
-    length = len(line)
+def peek(tokens: List[Token], index: int) -> Token:
+    """Token at index, EOF once past the end"""
+    return tokens[index] if index < len(tokens) else tokens[-1]
 
-    if index >= length:
-        return index
-
-    while line[index] == ' ' or line[index] == '\t':
-        index += 1
-        if index >= len(line):
-            break
-    return index
 
+def parse_node(tokens: List[Token], index: int):
+    """Parse an enclosed string or variable starting at tokens[index]"""
+    # Errors point right after the previous token, as the node is missing
+    err_pos = tokens[index - 1].end if index > 0 else 0
+    err = (None, index, err_pos, "Expected a string or variable")
 
-def strip_comment(line: str):
-    quote_count = 0
-    for i, x in enumerate(line[::-1]):
-        if x == '"':
-            quote_count += 1
-        elif x == '#':
-            return line[:len(line) - i - 1].rstrip()
-    return line
+    brace, val, close = (peek(tokens, i) for i in range(index, index + 3))
+    if brace.kind != BRACE or brace.value not in BRACES_ENDS:
+        return err
+    if close.kind != BRACE or close.value != BRACES_ENDS[brace.value]:
+        return err
 
+    if val.kind == STRING:
+        node: dict = {'value': string_value(val), 'type': 'string', 'enclosure': brace.value}
+    elif val.kind == IDENT:
+        node = {'value': (val.value, brace.value), 'type': 'variable'}
+    else:
+        return err
+    return node, index + 3, close.end, ''
 
-def parse_alpha(line: str, index: int = 0):
-    index = strip_empty(line, index)
-    length = len(line)
-    if index >= length:
-        return '', index, ''  # parsed, index, msg
 
-    position = index
-    while line[position] in string.ascii_letters:
-        position += 1
-        if position >= length:
-            return line[index:], position, ''
-    return line[index:position], position, ''
+def parse_declaration(tokens: List[Token]):
+    name, define, value, end = (peek(tokens, i) for i in range(4))
+    if name.kind != IDENT or define.kind == EOF:
+        return (None, name.end, 'Invalid variable declaration')
 
+    if define.kind != DEFINE:
+        return (None, define.col, 'Variable declaration missing `:=`')
 
-def parse_enclosed_alpha(line: str, index: int = 0):
-    line = strip_comment(line)
-    length = len(line)
-    pos = strip_empty(line, index)
+    if value.kind != STRING:
+        return None, value.col, "Invalid right hand side for declaration"
 
-    if pos > length:
-        return None, pos, ""
+    string_val = string_value(value)
+    if not string_val:
+        return None, value.end, "Invalid right hand side for declaration"
 
-    # Check if enclosing char present
-    if line[pos] in BRACES_ENDS:
-        brace = line[pos]
-    else:
-        return None, pos, "Invalid node: string should be enclosed"
+    if end.kind != EOF:
+        return None, end.col, "Trailing characters after declaration"
 
-    val, pos, _ = parse_alpha(line, pos + 1)
-    if val is None:
-        return None, pos, "Invalid string"
+    return (name.value, string_val), end.col, ''
 
-    pos = strip_empty(line, pos)
-    if pos > length or line[pos] != BRACES_ENDS[brace]:
-        return None, pos, "Invalid enclosure"
-    return (val, brace), pos + 1, ""
 
+LINKS_LIST = ['->', '<-', ]  # '|>', '<|']
 
-def parse_string_val(line: str, index: int = 0):
-    line = strip_comment(line)
-    pos = strip_empty(line, index)
 
-    match = re.match('^"(.*?)"', line[pos:])
-    if not match:
-        return None, pos, "Invalid string"
-    val = match.group(1)
-    return val, pos + len(val) + 2, ''
+def parse_chain(tokens: List[Token]):
+    vars = []
+    links = []
 
+    node, index, pos, err = parse_node(tokens, 0)
+    if node is None:
+        return None, pos, err
+    vars.append(node)
 
-def parse_enclosed_string_val(line: str, index: int = 0):
-    line = strip_comment(line)
-    length = len(line)
-    pos = strip_empty(line, index)
+    while tokens[index].kind != EOF:
+        link = tokens[index]
+        if link.kind != LINK or link.value not in LINKS_LIST:
+            return None, link.col, "Expected one of " + ', '.join(LINKS_LIST)
+        links.append(link.value)
 
-    if pos > length:
-        return None, pos, ""
+        # It should not be expecting to parse a variable as chain ends on variable, not link
+        if peek(tokens, index + 1).kind == EOF:
+            return None, link.end, "Dangling link."
 
-    # Check if enclosing char present
-    if line[pos] in BRACES_ENDS:
-        brace = line[pos]
-    else:
-        return None, pos, "Invalid node: string should be enclosed"
+        node, index, pos, err = parse_node(tokens, index + 1)
+        if node is None:
+            return None, pos, err
+        vars.append(node)
+    return (vars, links), pos, ''
 
-    val, pos, _ = parse_string_val(line, pos + 1)
-    if val is None:
-        return None, pos, "Invalid string"
 
-    pos = strip_empty(line, pos)
-    if pos > length or line[pos] != BRACES_ENDS[brace]:
-        return None, pos, "Invalid enclosure"
-    return (val, brace), pos + 1, ""
+DECLARATION = 'declaration'
+CHAIN = 'chain'
 
 
-def parse_declaration(line: str, index: int = 0):
-    line = strip_comment(line)
-    length = len(line)
-    pos = strip_empty(line, index)
-    if pos >= length:
-        return None, pos, 'Empty declaration'
+def parse_line(line: str):
+    """Parse a single line into (kind, parsed). Kind is None for blank and
+    comment lines"""
+    line = line.strip()
+    if not line or line[0] == '#':
+        return (None, None), 0, ''
 
-    (parsed, pos, _) = parse_alpha(line, pos)
-    pos = strip_empty(line, pos)
+    tokens = tokenize(line)
+    # Only declarations start with a bare identifier
+    if tokens[0].kind == IDENT:
+        kind = DECLARATION
+        parsed, err_col, err = parse_declaration(tokens)
+    else:
+        kind = CHAIN
+        parsed, err_col, err = parse_chain(tokens)
+    if parsed is None:
+        return None, err_col, err
+    return (kind, parsed), err_col, ''
 
-    if pos >= length or not parsed:
-        return (None, pos, 'Invalid variable declaration')
 
-    variable_name = parsed
+class Declaration(NamedTuple):
+    line_num: int
+    name: str
+    value: str
+    inline: bool = False  # Variables created for string nodes in chains
 
-    pos = strip_empty(line, pos)
-    if not line or line[pos:pos+2] != ':=':
-        return (None, pos, 'Variable declaration missing `:=`')
 
-    pos += 2
-    string_value, pos, _ = parse_string_val(line, pos)
+Endpoint = Tuple[str, str]  # (enclosure, variable name)
 
-    if not string_value:
-        return None, pos, "Invalid right hand side for declaration"
 
-    pos = strip_empty(line, pos)
-    if line[pos:] != '':
-        return None, pos, "Trailing characters after declaration"
+class Link(NamedTuple):
+    line_num: int
+    source: Endpoint
+    dest: Endpoint
 
-    return (variable_name, string_value), pos, ''
 
+def line_events(line_num: int, kind: str, parsed) -> Iterator:
+    """Declaration and Link events for a parsed line"""
+    if kind == DECLARATION:
+        name, val = parsed
+        yield Declaration(line_num, name, val)
+        return
 
-LINKS_LIST = ['->', '<-', ]  # '|>', '<|']
+    if kind != CHAIN:
+        return
 
+    nodes, link_types = parsed
 
-def parse_chain(line: str, index: int = 0):
-    vars = []
-    links = []
-
-    parse_var = True
-    pos = index
-    curr_val = {}
-
-    line = strip_comment(line)
-    length = len(line)
-    while index < length:
-        if parse_var:
-            str_val, pos, er = parse_enclosed_string_val(line, index)
-            if str_val is not None:
-                val, enclosure = str_val
-                curr_val['value'] = val
-                curr_val['type'] = 'string'
-                curr_val['enclosure'] = enclosure
-                index = pos
-                parse_var = False
-            else:
-                var_val, pos, er = parse_enclosed_alpha(line, index)
-                if var_val:
-                    curr_val['value'] = var_val
-                    curr_val['type'] = 'variable'
-                    index = pos
-                    parse_var = False
-                else:
-                    return None, index, "Expected a string or variable"
-            vars.append({**curr_val})
-            curr_val = {}
+    node_vars = []
+    for node in nodes:
+        if node['type'] == 'string':
+            # Create a variable, quoted so that it never clashes with identifiers
+            var = f'"{node["value"]}"'
+            yield Declaration(line_num, var, node['value'], inline=True)
+            node_vars.append((node['enclosure'], var))
         else:
-            pos = strip_empty(line, index)
-            if pos >= len(line):
-                break
-            if line[pos:pos+2] not in LINKS_LIST:
-                return None, pos, "Expected one of " + ', '.join(LINKS_LIST)
-
-            links.append(line[pos:pos+2])
-            index = pos + 2
-            parse_var = True
-    # It should not be expecting to parse a variable as chain ends on variable, not link
-    if parse_var:
-        return None, index, "Dangling link."
-    return (vars, links), index, ''
-
-
-def parse(input: str):
-    """Takes in a string input and returns a graph"""
-    var_definitions_map = OrderedDict()
-    links = OrderedDict()
-
+            var, enclosure = node['value']
+            node_vars.append((enclosure, var))
+    # Now nodes are ready, create links
+    for (source, dest), link_type in zip(zip(node_vars, node_vars[1:]), link_types):
+        if link_type == '<-':
+            source, dest = dest, source
+        yield Link(line_num, source, dest)
+
+
+def result_events(results: Iterable, start: int = 0) -> Iterator:
+    """Events for consecutive parse_line results, the first being line start"""
+    for line_num, (parsed, err_col, err) in enumerate(results, start):
+        if parsed is None:
+            raise SyntaxError(f'SYNTAX_ERROR<Line {line_num+1}, Col {err_col+1}>: {err}')
+        yield from line_events(line_num, *parsed)
+
+
+def iter_events(lines: Iterable[str]) -> Iterator:
+    """Lazily parse lines, from a file object or any iterator, into events"""
+    return result_events(parse_line(line) for line in lines)
+
+
+def redefinition_error(line_num: int, name: str) -> SemanticError:
+    return SemanticError(f"ERROR<Line {line_num + 1}>: variable '{name}' already defined")
+
+
+class GraphBuilder:
+    """Collects parse events into the variable map and link table, both keyed
+    by interned symbol ids"""
+
+    def __init__(self):
+        self.symbols = SymbolTable()
+        self.var_definitions_map: OrderedDict = OrderedDict()
+        self.links: OrderedDict = OrderedDict()
+
+    def add(self, event):
+        intern = self.symbols.intern
+        if isinstance(event, Link):
+            source = (event.source[0], intern(event.source[1]))
+            dest = (event.dest[0], intern(event.dest[1]))
+            dests = self.links.get(source)
+            if dests is None:
+                self.links[source] = dests = []
+            dests.append(dest)
+        elif event.inline:
+            self.var_definitions_map[intern(event.name)] = event.value
+        else:
+            symbol = intern(event.name)
+            present = self.var_definitions_map.get(symbol)
+            if present is not None:
+                raise redefinition_error(event.line_num, event.name)
+            self.var_definitions_map[symbol] = event.value
+
+    def feed(self, events: Iterable):
+        for event in events:
+            self.add(event)
+        return self
+
+    def graph(self, compact: bool = False):
+        return to_graph(self.var_definitions_map, self.links, self.symbols, compact)
+
+
+def parse_stream(lines: Iterable[str], compact: bool = False):
+    """Takes in a file object or an iterator of lines and returns a graph.
+    Lines are read one at a time, the source is never held in memory"""
+    with instrument.stage('parse'):
+        builder = GraphBuilder().feed(iter_events(lines))
+    with instrument.stage('to_graph'):
+        return builder.graph(compact)
+
+
+def parse(input: str, compact: bool = False):
+    """Takes in a string input and returns a graph, a CompactGraph if compact"""
+    return parse_stream(input.split('\n'), compact)
+
+
+def parse_chunk(lines: List[str], start: int) -> tuple:
+    """Builder state of a chunk of lines, the first being line start, for
+    merge_chunks. It is made of plain containers to pickle compactly:
+    (symbols, vars, links, declared, error). Declared has the first line
+    declaring each variable, error is (line number, exception) if the chunk
+    has an error, parsing stops at the first one"""
+    builder = GraphBuilder()
+    intern = builder.symbols.intern
+    declared: Dict[int, int] = {}
+    error = None
+    for line_num, line in enumerate(lines, start):
+        try:
+            for event in result_events([parse_line(line)], line_num):
+                if isinstance(event, Declaration) and not event.inline:
+                    declared.setdefault(intern(event.name), line_num)
+                builder.add(event)
+        except (SyntaxError, SemanticError) as e:
+            error = line_num, e
+            break
+    vars, links = dict(builder.var_definitions_map), dict(builder.links)
+    return builder.symbols.symbols, vars, links, declared, error
+
+
+def merge_chunks(chunks: Iterable[tuple]) -> GraphBuilder:
+    """Merge parse_chunk results, in line order, into one builder. The first
+    SyntaxError or SemanticError raised is the one a serial parse would raise"""
+    builder = GraphBuilder()
+    intern = builder.symbols.intern
+    vars, links = builder.var_definitions_map, builder.links
+    for names, chunk_vars, chunk_links, declared, error in chunks:
+        ids = [intern(name) for name in names]
+        # Variables already declared by an earlier chunk
+        redefined = [(line, names[symbol]) for symbol, line in declared.items() if ids[symbol] in vars]
+        if redefined:
+            line_num, name = min(redefined)
+            if error is None or line_num < error[0]:
+                raise redefinition_error(line_num, name)
+        if error is not None:
+            raise error[1]
+
+        for symbol, value in chunk_vars.items():
+            vars[ids[symbol]] = value
+        for (type, symbol), dests in chunk_links.items():
+            source = type, ids[symbol]
+            merged = links.get(source)
+            if merged is None:
+                links[source] = merged = []
+            merged.extend([(dest_type, ids[dest]) for dest_type, dest in dests])
+    return builder
+
+
+def parse_parallel(input: str, workers: Optional[int] = None, chunk_size: int = 20000) -> Graph:
+    """Parse chunks of lines in a process pool and merge them in order.
+
+    Each worker builds the variable map and link table of its chunk, keyed
+    by its own symbol ids, so only the merge of those is left to do here.
+    The first SyntaxError or SemanticError is the one a serial parse would
+    raise.
+    """
     lines = input.split('\n')
-    for line_num, line in enumerate(lines):
-        line = line.strip()
-        if not line or line[0] == '#':
-            continue
-        declaration, dec_position, dec_err = parse_declaration(line, 0)
-        if declaration is None:
-            chain, chain_position, chain_err = parse_chain(line, 0)
-            if chain is None:
-                err = dec_err if dec_position > chain_position else chain_err
-                err_col = max(dec_position, chain_position)
-                raise SyntaxError(f'SYNTAX_ERROR<Line {line_num+1}, Col {err_col+1}>: {err}')
+    if len(lines) <= chunk_size or workers == 1:
+        return parse_stream(lines)
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(parse_chunk, lines[i:i + chunk_size], i)
+            for i in range(0, len(lines), chunk_size)
+        ]
+        try:
+            return merge_chunks(f.result() for f in futures).graph()
+        finally:
+            # Chunks after an error are of no use
+            for future in futures:
+                future.cancel()
+
+
+class _SessionLine:
+    """A line of a session's document, with its events interned"""
+    __slots__ = 'key', 'text', 'result', 'declarations', 'links'
+
+    def __init__(self, text: str, result: tuple, symbols: SymbolTable):
+        self.key = 0  # Orders lines, kept increasing along the document
+        self.text = text
+        self.result = result
+        self.declarations: List[Tuple[int, str, bool]] = []  # (symbol, value, inline)
+        self.links: Dict[Tuple[str, int], list] = {}  # Dests of each source, in order
+        if result[0] is None:
+            return
+
+        intern = symbols.intern
+        for event in line_events(0, *result[0]):
+            if isinstance(event, Link):
+                source = (event.source[0], intern(event.source[1]))
+                dest = (event.dest[0], intern(event.dest[1]))
+                self.links.setdefault(source, []).append(dest)
             else:
-                nodes, link_types = chain
-
-                node_vars = []
-                for i, node in enumerate(nodes):
-                    type = node['type']
-                    var = node['value']
-                    if type == 'string':
-                        # Create a variable
-                        var = str(string_hash(node['value'] + (node['enclosure'] or '')))
-                        var_definitions_map[var] = node['value']
-                        node_vars.append(f"{node['enclosure']}{var}")
-                    else:
-                        node_vars.append(f"{node['value'][1]}{node['value'][0]}")
-                # Now nodes are ready, create links
-                for (source, dest), link_type in zip(zip(node_vars, node_vars[1:]), link_types):
-                    if link_type == '<-':
-                        source, dest = dest, source
-                    links[source] = [*links.get(source, []), dest]
+                self.declarations.append((intern(event.name), event.value, event.inline))
+
+
+class ParseSession:
+    """Stateful parser for documents that are parsed again after small edits.
+
+    The session keeps the document's lines with their events, and the
+    variable map and link table they build. An update finds the edited range
+    of lines, between the unchanged start and end of the document, and only
+    retracts the events of the lines it removes and applies those of the
+    lines it adds. Added lines are parsed unless the same content is already
+    in the document. Link tables are kept in line order, so graphs are the
+    same as parse() builds. When the document has an error the events are
+    replayed in line order, to raise exactly the error parse() would.
+    """
+
+    KEY_GAP = 1 << 32  # Between line keys, leaving room for inserted lines
+
+    def __init__(self):
+        self.lines: List[_SessionLine] = []
+        self.cache: Dict[str, tuple] = {}  # parse_line result of each line content
+        self.counts: Dict[str, int] = {}  # Lines with each content
+        self.parsed_lines = 0  # Number of lines actually parsed so far
+        self.symbols = SymbolTable()
+
+        self.errors = 0  # Lines with a syntax error
+        self.declared: Dict[int, List[str]] = {}  # Values declared for each symbol
+        self.inline: Dict[int, List[str]] = {}  # Same, from string nodes in chains
+        self.references: Dict[int, int] = {}  # Link endpoints naming each symbol
+        self.vars: Dict[int, str] = {}
+        self.redefined: set = set()
+        self.undefined: set = set()
+
+        self.sources: Dict[Tuple[str, int], List[_SessionLine]] = {}  # Lines linking from each
+        self.dests: Dict[Tuple[str, int], list] = {}
+        self.order: Optional[list] = []  # Sources in order of first link, None once stale
+        self.nodes: Dict[Tuple[str, int], Node] = {}  # Of the last graph, by endpoint
+        self.relinked: set = set()  # Sources whose dests changed since the last graph
+
+    def update(self, input: str) -> Graph:
+        texts = input.split('\n')
+        old = self.lines
+        start, old_end, new_end = 0, len(old), len(texts)
+        limit = min(old_end, new_end)
+        while start < limit and old[start].text == texts[start]:
+            start += 1
+        while old_end > start and new_end > start and old[old_end - 1].text == texts[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+
+        removed = old[start:old_end]
+        added = [self._line(text) for text in texts[start:new_end]]
+        self.lines[start:old_end] = added
+        self._number(start, len(added))
+
+        changed: set = set()
+        touched: Dict[Tuple[str, int], Optional[_SessionLine]] = {}
+        for line in removed:
+            self._retract(line, changed, touched)
+            self._forget(line.text)
+        for line in added:
+            self._apply(line, changed, touched)
+        for symbol in changed:
+            self._check(symbol)
+        self._relink(touched)
+
+        if self.errors or self.redefined or self.undefined:
+            results = (line.result for line in self.lines)
+            return GraphBuilder().feed(result_events(results)).graph()
+
+        if self.order is None:
+            self.order = sorted(self.sources, key=self._first_link)
+        return self._graph()
+
+    def _line(self, text: str) -> _SessionLine:
+        result = self.cache.get(text)
+        if result is None:
+            result = self.cache[text] = parse_line(text)
+            self.parsed_lines += 1
+        self.counts[text] = self.counts.get(text, 0) + 1
+        return _SessionLine(text, result, self.symbols)
+
+    def _forget(self, text: str):
+        count = self.counts[text] - 1
+        if count:
+            self.counts[text] = count
         else:
-            name, val = declaration
+            del self.counts[text]
+            del self.cache[text]
+
+    def _number(self, start: int, count: int):
+        """Key the count lines from start between their neighbours"""
+        lines, gap = self.lines, self.KEY_GAP
+        end = start + count
+        low = lines[start - 1].key if start > 0 else None
+        high = lines[end].key if end < len(lines) else None
+        if low is None:
+            low = (high if high is not None else 0) - (count + 1) * gap
+        if high is None:
+            high = low + (count + 1) * gap
+        step = (high - low) // (count + 1)
+        if step == 0:
+            for i, line in enumerate(lines):
+                line.key = i * gap
+            return
+        for i in range(start, end):
+            low += step
+            lines[i].key = low
+
+    def _apply(self, line: _SessionLine, changed: set, touched: dict):
+        if line.result[0] is None:
+            self.errors += 1
+            return
+        for symbol, value, inline in line.declarations:
+            (self.inline if inline else self.declared).setdefault(symbol, []).append(value)
+            changed.add(symbol)
+        for source, dests in line.links.items():
+            touched.setdefault(source, self._first_line(source))
+            self.sources.setdefault(source, []).append(line)
+            for _, symbol in (source, *dests):
+                self.references[symbol] = self.references.get(symbol, 0) + 1
+                changed.add(symbol)
+
+    def _retract(self, line: _SessionLine, changed: set, touched: dict):
+        if line.result[0] is None:
+            self.errors -= 1
+            return
+        for symbol, value, inline in line.declarations:
+            declared = self.inline if inline else self.declared
+            declared[symbol].remove(value)
+            if not declared[symbol]:
+                del declared[symbol]
+            changed.add(symbol)
+        for source, dests in line.links.items():
+            touched.setdefault(source, self._first_line(source))
+            self.sources[source].remove(line)
+            for _, symbol in (source, *dests):
+                self.references[symbol] -= 1
+                if not self.references[symbol]:
+                    del self.references[symbol]
+                changed.add(symbol)
+
+    def _check(self, symbol: int):
+        declared = self.declared.get(symbol) or self.inline.get(symbol)
+        if declared:
+            self.vars[symbol] = declared[0]
+        else:
+            self.vars.pop(symbol, None)
 
-            present = var_definitions_map.get(name)
-            if present is not None:
-                raise SemanticError(f"ERROR<Line {line_num + 1}>: variable '{name}' already defined")
-            else:
-                var_definitions_map[name] = val
+        if len(self.declared.get(symbol, ())) > 1:
+            self.redefined.add(symbol)
+        else:
+            self.redefined.discard(symbol)
+        if symbol in self.references and not declared:
+            self.undefined.add(symbol)
+        else:
+            self.undefined.discard(symbol)
+
+    def _relink(self, touched: dict):
+        """Rebuild the dests of the touched sources, from their lines"""
+        self.relinked.update(touched)
+        for source, first in touched.items():
+            lines = self.sources.get(source)
+            if not lines:
+                self.sources.pop(source, None)
+                self.dests.pop(source, None)
+                self.order = None
+                continue
+            lines.sort(key=lambda line: line.key)
+            self.dests[source] = [dest for line in lines for dest in line.links[source]]
+            if lines[0] is not first:
+                self.order = None
+
+    def _graph(self) -> Graph:
+        """Graph of the link table, with nodes in the order to_graph creates
+        them. Nodes of the last graph are reused when their value and
+        adjacents are unchanged, the graphs handed out are never modified"""
+        dests = self.dests
+        order = dict.fromkeys(itertools.chain.from_iterable(
+            (source, *dests[source]) for source in self.order or ()
+        ))
+        old, nodes, vars, created = self.nodes, {}, self.vars, []
+        for endpoint in order:
+            type, symbol = endpoint
+            node = old.get(endpoint)
+            if node is None or endpoint in self.relinked or node.value != vars[symbol]:
+                new = Node(self.symbols.symbol(symbol), vars[symbol], type, symbol)
+                if node is not None:
+                    new.id = node.id  # Keeps the adjacents of other nodes valid
+                created.append((endpoint, new))
+                node = new
+            nodes[endpoint] = node
+        for endpoint, node in created:
+            node.adjacents = [nodes[dest].id for dest in dests.get(endpoint, ())]
+
+        self.nodes = nodes
+        self.relinked = set()
+        return Graph(list(nodes.values()), self.symbols)
+
+    def _first_line(self, source) -> Optional[_SessionLine]:
+        lines = self.sources.get(source)
+        return lines[0] if lines else None
+
+    def _first_link(self, source) -> tuple:
+        """Sort key of sources, in the order parse() first sees them"""
+        line = self.sources[source][0]
+        return line.key, list(line.links).index(source)
+
+
+def to_graph(vars: dict, links: dict, symbols: SymbolTable, compact: bool = False):
+    """Links are keyed by (enclosure, symbol id), vars by symbol id"""
+    undefined = next((s for s in symbols.ids.values() if s not in vars), None)
+    if undefined is not None:
+        raise SemanticError(f"ERROR: variable '{symbols.symbol(undefined)}' not defined")
+
+    if compact:
+        return CompactGraph.from_links(vars, links, symbols)
 
-    return to_graph(var_definitions_map, links)
+    nodes: dict = {}
 
+    def create_node(endpoint):
+        type, symbol = endpoint
+        nodes[endpoint] = Node(symbols.symbol(symbol), vars[symbol], type, symbol)
 
-def to_graph(vars: dict, links: dict) -> Graph:
-    nodes: dict = {}
     for source, dests in links.items():
-        type, varname = source[0], source[1:]
         if source not in nodes:
-            nodes[source] = Node(varname, vars[varname], type)
+            create_node(source)
         for dest in dests:
-            dtype, dname = dest[0], dest[1:]
             if dest not in nodes:
-                nodes[dest] = Node(dname, vars[dname], dtype)
+                create_node(dest)
             nodes[source].adjacents.append(nodes[dest].id)
 
     casted_nodes = cast(List[Node], nodes.values())
-    return Graph(casted_nodes)
+    return Graph(casted_nodes, symbols)
 
 
 if __name__ == '__main__':
     with open('diagram.dsl') as f:
-        graph = parse(f.read())
+        graph = parse_stream(f)
         print(graph)
@@ -0,0 +1,41 @@
+import math
+
+from PIL import ImageDraw
+
+from .display import DisplayList, LineCommand, ArcCommand, RectangleCommand, TextCommand
+from .fonts import get_font
+from . import instrument
+
+
+def snap(*values):
+    """Round coordinates half up, so that drawing is unaffected by integer
+    translations, e.g. when rendering tiles"""
+    return tuple(math.floor(v + 0.5) for v in values)
+
+
+class PillowBackend:
+    """Executes display lists on a Pillow image through one drawing context"""
+
+    def __init__(self, img):
+        self.img = img
+        self.draw = ImageDraw.Draw(img)
+
+    def execute(self, display_list: DisplayList):
+        instrument.count('primitives_drawn', len(display_list))
+        groups = display_list.groups
+
+        rectangle = self.draw.rectangle
+        for cmd in groups[RectangleCommand]:
+            rectangle(snap(*cmd.top_left, *cmd.bottom_right))
+
+        line = self.draw.line
+        for cmd in groups[LineCommand]:
+            line(snap(*cmd.start, *cmd.end), width=cmd.width)
+
+        arc = self.draw.arc
+        for cmd in groups[ArcCommand]:
+            arc(snap(*cmd.box), cmd.start, cmd.end)
+
+        text = self.draw.text
+        for cmd in groups[TextCommand]:
+            text(snap(*cmd.position), cmd.text, font=get_font(cmd.font, cmd.size))
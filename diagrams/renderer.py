@@ -1,85 +1,375 @@
-from PIL import ImageDraw, ImageFont, Image
+import math
 
-import shapes
-from utils.geometry import add_points, rad_to_deg
-from graph import Graph
+from typing import Optional
+
+from . import instrument, shapes
+from .display import DisplayList, compile_object
+from .scene import Scene
+from .svg_backend import SVGBackend
+from .tiles import TileRenderer, command_box, render_commands
+from .text_metrics import measure_many
+from .graph import Graph
+from .layout import Channels, layered_layout
+from .utils.spatial import UniformGrid, boxes_intersect, segment_box_entry
+from .utils import vectorized
 
 RENDERFONT = 'Ubuntu-R'
 
 
 def render_object(img, obj):
-    draw = ImageDraw.Draw(img)
-
-    if obj.type == 'rectangle':
-        draw.rectangle((obj.top_left, obj.bottom_right))
-
-    elif obj.type == 'text':
-        draw.text(obj.position, obj.text, font=ImageFont.truetype(obj.font))
-
-    elif obj.type == 'line':
-        draw.line(obj.start + obj.end)
-
-    elif obj.type == 'arc':
-        x0, y0 = add_points(obj.center, (-obj.radius, -obj.radius))
-        x1, y1 = add_points(obj.center, (obj.radius, obj.radius))
-        start = rad_to_deg(-obj.end)
-        end = rad_to_deg(-obj.start)
-        draw.arc((x0, y0, x1, y1), start, end)
-
-    else:
-        [render_object(img, x) for x in obj.primitives]
+    """Draw a single shape. Prefer batching shapes in a DisplayList"""
+    from .pillow_backend import PillowBackend
+    PillowBackend(img).execute(DisplayList(compile_object(obj)))
 
 
 class GraphRenderer:
-    def __init__(self, graph: Graph, img_width: int, img_height: int):
+    def __init__(self, graph: Graph, img_width: Optional[int] = None,
+                 img_height: Optional[int] = None):
+        """Image dimensions not given are computed from the layout"""
         self.graph = graph
+        self.img_width = img_width
+        self.img_height = img_height
+        self.shapes: dict = {}
+        self.layout = None
+        self.index = None
+        self.channels = None
         self.rendered_nodes: dict = {}
         self.rendered_links: dict = {}
-        self.width = img_width
-        self.height = img_height
+        # Known once the nodes are placed
+        self.width = img_width or 0
+        self.height = img_height or 0
+        self.display_list = DisplayList()
+        self.items: dict = {}  # Draw commands of each node and link
+        self.signatures: dict = {}  # What each item was compiled from
+        self.reusable: dict = {}  # Previous (signature, commands) of each item
+        self.node_boxes: dict = {}  # Shape box of each node key
+        self.routes: dict = {}  # Area and straight segment each link was routed by
+        self.item_index: Optional[UniformGrid] = None  # Boxes of the drawn items
+        self.pending_links: list = []
         self.img = None
 
+    def place_nodes(self):
+        """Create the shape of every node and center it as per the layout"""
+        with instrument.stage('shapes'):
+            # Size every node up front, shapes then hit the metrics cache
+            measure_many((node.value for node in self.graph.nodes), RENDERFONT)
+
+            self.shapes = {node.id: get_render_shape(node) for node in self.graph.nodes}
+            sizes = {id: shape.size for id, shape in self.shapes.items()}
+
+        with instrument.stage('layout'):
+            self.layout = layered_layout(self.graph, sizes)
+            for id, center in self.layout.centers.items():
+                self.shapes[id].center = center
+
+            # Index the placed shapes for arrow routing and hit testing
+            cell_size = 2 * max((max(size) for size in sizes.values()), default=50)
+            self.index = UniformGrid(cell_size)
+            for id, shape in self.shapes.items():
+                self.index.insert(id, shape_box(shape.center, sizes[id]))
+            self.channels = Channels(self.layout, self.index.boxes)
+
+        self.width = self.img_width or math.ceil(self.layout.width)
+        self.height = self.img_height or math.ceil(self.layout.height)
+
     def render_chain(self, node):
         if node.id not in self.rendered_nodes:
-            obj = get_render_shape(node)
-            obj.center = (100, 50 + 100*len(self.rendered_nodes))
-            render_object(self.img, obj)
+            obj = self.shapes[node.id]
+            self.add_item(self.node_key(node.id), obj, (obj.template_key(), obj.center))
             self.rendered_nodes[node.id] = obj
         obj = self.rendered_nodes[node.id]
 
         # Render linked nodes and links
         for adj in node.adjacents:
             if adj not in self.rendered_nodes:
-                adjnode = self.graph.get_node(adj)
-                adjobj = get_render_shape(adjnode)
-                adjobj.center = (100, 50 + 100*len(self.rendered_nodes))
-                render_object(self.img, adjobj)
+                adjobj = self.shapes[adj]
+                self.add_item(self.node_key(adj), adjobj, (adjobj.template_key(), adjobj.center))
                 self.rendered_nodes[adj] = adjobj
             adjobj = self.rendered_nodes[adj]
 
-            # Create link
+            # Links are created together once all nodes are placed
+            self.pending_links.append((node.id, adj))
+
+            # Update rendered links
+            self.rendered_links.setdefault(node.id, set()).add(adj)
+
+    def node_key(self, node_id):
+        """Identifies a node across graphs parsed from edited documents"""
+        node = self.graph.get_node(node_id)
+        return node.type, node.varname
+
+    def link_key(self, source_id, dest_id):
+        return 'link', self.node_key(source_id), self.node_key(dest_id)
+
+    def add_item(self, key, obj, signature=None):
+        """Add the draw commands of a node or link. Those compiled from the
+        same signature by the previous compose are reused"""
+        previous = self.reusable.get(key)
+        if signature is not None and previous is not None and previous[0] == signature:
+            commands = previous[1]
+        else:
+            commands = tuple(compile_object(obj))
+        self.items[key] = commands
+        self.signatures[key] = signature
+        self.display_list.extend(commands)
+
+    def create_arrows(self, links):
+        """Arrows for (source id, dest id) links. With NumPy, box shaped
+        nodes are clipped and arrow heads computed in one batch"""
+        if vectorized.np is None or not links:
+            return [self.route_arrow(source, dest) for source, dest in links]
+
+        boxes = self.index.boxes
+        sources = [self.shapes[source] for source, _ in links]
+        dests = [self.shapes[dest] for _, dest in links]
+        source_centers = [obj.center for obj in sources]
+        dest_centers = [obj.center for obj in dests]
+        starts = vectorized.clip_to_boxes(
+            source_centers, dest_centers, [boxes[source] for source, _ in links]
+        ).tolist()
+        ends = vectorized.clip_to_boxes(
+            dest_centers, source_centers, [boxes[dest] for _, dest in links]
+        ).tolist()
+
+        arrows = []
+        clipped = 0  # Ends taken from the batch, the shapes count their own
+        for (source, dest), obj, adjobj, start, end in zip(links, sources, dests, starts, ends):
+            # Rounded corners and slanted sides are clipped by the shapes
+            if type(obj) is shapes.TextInRectangle:
+                clipped += 1
+            else:
+                start = obj.intersection_from(*adjobj.center)
+            if type(adjobj) is shapes.TextInRectangle:
+                clipped += 1
+            else:
+                end = adjobj.intersection_from(*obj.center)
+            arrows.append(self.route_arrow(source, dest, tuple(start), tuple(end)))
+        instrument.count('intersection_tests', clipped)
+
+        heads = vectorized.arrow_heads(
+            [(arrow.waypoints or [arrow.start])[-1] for arrow in arrows],
+            [arrow.end for arrow in arrows],
+        )
+        for arrow, head1, head2 in zip(arrows, *(h.tolist() for h in heads)):
+            arrow.heads = (tuple(head1), tuple(head2))
+        return arrows
+
+    def route_arrow(self, source_id, dest_id, arr_start=None, arr_end=None):
+        """Arrow between two placed nodes, bent around nodes in the way"""
+        obj, adjobj = self.shapes[source_id], self.shapes[dest_id]
+        if arr_start is None:
             arr_start = obj.intersection_from(*adjobj.center)
+        if arr_end is None:
             arr_end = adjobj.intersection_from(*obj.center)
-            arrow = shapes.Arrow(arr_start, arr_end)
-            render_object(self.img, arrow)
 
-            # Update rendered links
-            self.rendered_links[node.id] = {
-                * self.rendered_links.get(node.id, set()),
-                adj
-            }
+        key = self.link_key(source_id, dest_id)
+        if self.index.any_in_the_way(arr_start, arr_end, ignore=(source_id, dest_id)):
+            # Through the gaps between layers and between the nodes in them
+            waypoints = self.channels.waypoints(source_id, dest_id)
+            self.routes[key] = (self.channels.region(source_id, dest_id), None)
+        else:
+            waypoints = []
+            (x0, y0), (x1, y1) = arr_start, arr_end
+            box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+            self.routes[key] = (box, [(arr_start, arr_end)])
+        if waypoints:
+            # Leave and enter the shapes towards the bends instead
+            arr_start = obj.intersection_from(*waypoints[0])
+            arr_end = adjobj.intersection_from(*waypoints[-1])
+        return shapes.Arrow(arr_start, arr_end, waypoints)
 
-    def render(self):
-        self.img = Image.new('RGB', (self.width, self.height))
+    def node_at(self, x, y):
+        """Id of the node whose shape box contains the point, None if none"""
+        return next(iter(self.index.query_point(x, y)), None)
+
+    def overlapping_nodes(self):
+        """Pairs of node ids whose shape boxes overlap"""
+        return self.index.overlapping_pairs()
 
+    def compose(self):
+        """Place the nodes and collect draw commands for nodes and arrows.
+        Nodes whose shape and center did not change keep their commands, and
+        links keep their route unless an end or a node in the way moved"""
+        old_boxes = self.node_boxes
+        self.place_nodes()
+        self.node_boxes = {self.node_key(id): box for id, box in self.index.boxes.items()}
+        self.reusable = {
+            key: (self.signatures[key], commands) for key, commands in self.items.items()
+        }
+        # Boxes of the nodes added, moved or removed, at both positions
+        moved = UniformGrid(self.index.cell_size)
+        for key, box in old_boxes.items():
+            if self.node_boxes.get(key) != box:
+                moved.insert(('old', key), box)
+        for key, box in self.node_boxes.items():
+            if old_boxes.get(key) != box:
+                moved.insert(('new', key), box)
+
+        self.display_list = DisplayList()
+        self.items = {}
+        self.signatures = {}
+        self.rendered_nodes = {}
+        self.rendered_links = {}
+        self.pending_links = []
         for node in self.graph.nodes:
             self.render_chain(node)
 
+        links = [
+            (self.link_key(source, dest), (source, dest)) for source, dest in self.pending_links
+        ]
+        signatures = [(self.signatures[key[1]], self.signatures[key[2]]) for key, _ in links]
+        with instrument.stage('arrows'):
+            fresh = []
+            for (key, link), signature in zip(links, signatures):
+                if not self.route_reusable(key, signature, moved):
+                    self.reusable.pop(key, None)
+                    fresh.append(link)
+            arrows = dict(zip(fresh, self.create_arrows(fresh)))
+        for (key, link), signature in zip(links, signatures):
+            self.add_item(key, arrows.get(link), signature)
+
+        for key in self.routes.keys() - self.items.keys():
+            del self.routes[key]
+        self.reusable = {}
+
+    def route_reusable(self, key, signature, moved):
+        """Whether the link keeps its route: its ends are the same and no
+        moved node box crosses its straight segment, or for a bent route is
+        in the layers it depends on"""
+        previous = self.reusable.get(key)
+        if previous is None or previous[0] != signature:
+            return False
+        box, segments = self.routes[key]
+        if segments is None:
+            return not moved.query(box)
+        return not any(
+            segment_box_entry(*segment, moved.boxes[hit]) is not None
+            for hit in moved.query(box) for segment in segments
+        )
+
+    def render(self):
+        """Draw the graph on a new image, kept as self.img and returned"""
+        from PIL import Image
+        from .pillow_backend import PillowBackend
+
+        self.compose()
+        self.item_index = None
+        with instrument.stage('draw'):
+            self.img = img = Image.new('RGB', (self.width, self.height))
+            PillowBackend(img).execute(self.display_list)
+        return img
+
+    def update(self, graph: Graph):
+        """Render a new graph, typically parsed from an edited document, on
+        the retained image. Only the regions covering nodes and links whose
+        draw commands changed are repainted, drawing only the items reaching
+        into them. Returns the repainted boxes"""
+        from PIL import Image
+        from .pillow_backend import PillowBackend
+
+        old_items, old_size = self.items, (self.width, self.height)
+        self.graph = graph
+        if self.img is None:
+            self.render()
+            return [(0, 0, self.width, self.height)]
+
+        self.compose()
+        if self.item_index is None:
+            self.item_index = UniformGrid(self.index.cell_size)
+            for key, commands in self.items.items():
+                self.item_index.insert(key, items_box(commands))
+
+        boxes = []
+        for key in old_items.keys() | self.items.keys():
+            old, new = old_items.get(key, ()), self.items.get(key, ())
+            if old is new:  # Reused by compose
+                continue
+            if new:
+                self.item_index.insert(key, items_box(new))
+            elif key in self.item_index.boxes:
+                self.item_index.remove(key)
+            if old != new:
+                boxes.extend(self.pixel_box(command_box(cmd)) for cmd in old + new)
+
+        if (self.width, self.height) != old_size:
+            self.img = Image.new('RGB', (self.width, self.height))
+            PillowBackend(self.img).execute(self.display_list)
+            return [(0, 0, self.width, self.height)]
+
+        boxes = [box for box in merge_boxes(boxes) if box[0] < box[2] and box[1] < box[3]]
+        order = {key: i for i, key in enumerate(self.items)}
+        for box in boxes:
+            x0, y0, x1, y1 = box
+            keys = sorted(self.item_index.query((x0, y0, x1 - 1, y1 - 1)), key=order.__getitem__)
+            commands = (cmd for key in keys for cmd in self.items[key])
+            self.img.paste(render_commands(commands, box), box[:2])
+        return boxes
+
+    def pixel_box(self, box, margin=2):
+        """Integer box around box, wide enough for strokes and glyphs"""
+        x0, y0, x1, y1 = box
+        return (
+            max(0, math.floor(x0) - margin), max(0, math.floor(y0) - margin),
+            min(self.width, math.ceil(x1) + margin + 1),
+            min(self.height, math.ceil(y1) + margin + 1),
+        )
+
+    def render_svg(self, stream):
+        """Write the diagram as SVG to a text stream, without a raster image"""
+        self.compose()
+        with SVGBackend(stream, self.width, self.height) as svg:
+            svg.execute(self.display_list)
+
+    def render_tiles(self, directory, tile_size=512):
+        """Render tile by tile into directory, never allocating the canvas"""
+        self.compose()
+        return TileRenderer(self.scene(), tile_size).save(directory)
+
+    def scene(self) -> Scene:
+        """Retained scene of the last render, for rendering it again"""
+        return Scene(self.width, self.height, self.display_list)
+
     def save_to(self, filename):
-        self.img.save(filename)
+        with instrument.stage('encode'):
+            self.img.save(filename)
         print(f'IMAGE SAVED TO {filename}')
 
 
+def merge_boxes(boxes):
+    """Union of boxes as disjoint boxes, merging those that overlap"""
+    merged = []
+    for box in boxes:
+        # Absorb every merged box touching the new one, until none does
+        while True:
+            overlapping = [m for m in merged if boxes_intersect(m, box)]
+            if not overlapping:
+                break
+            for m in overlapping:
+                merged.remove(m)
+            box = (
+                min(box[0], *(m[0] for m in overlapping)),
+                min(box[1], *(m[1] for m in overlapping)),
+                max(box[2], *(m[2] for m in overlapping)),
+                max(box[3], *(m[3] for m in overlapping)),
+            )
+        merged.append(box)
+    return merged
+
+
+def items_box(commands):
+    """Box of draw commands, widened by the stroke pixels spilling over"""
+    boxes = [command_box(cmd) for cmd in commands]
+    return (
+        min(box[0] for box in boxes) - 1, min(box[1] for box in boxes) - 1,
+        max(box[2] for box in boxes) + 1, max(box[3] for box in boxes) + 1,
+    )
+
+
+def shape_box(center, size):
+    (x, y), (w, h) = center, size
+    return (x - w / 2, y - h / 2, x + w / 2, y + h / 2)
+
+
 def get_render_shape(node):
     node_center = (0, 0)
     padding = 20
@@ -96,14 +386,12 @@ def get_render_shape(node):
 
 
 def main():
-    from parser import parse
+    from .parser import parse
     with open('diagram.dsl') as f:
         graph = parse(f.read())
-        w = 500
-        h = 500
         filename = '/tmp/text.png'
 
-        renderer = GraphRenderer(graph, w, h)
+        renderer = GraphRenderer(graph)
         renderer.render()
         renderer.save_to(filename)
 
@@ -0,0 +1,145 @@
+import struct
+import sys
+import zlib
+
+from array import array
+from typing import BinaryIO, Dict, List
+
+from .display import DisplayList, LineCommand, ArcCommand, RectangleCommand, TextCommand
+
+"""
+Retained scene: the laid out and flattened draw commands of a diagram. A scene
+can be saved to a compact binary file and rendered again, at any scale or with
+any backend, without parsing, layout or geometry.
+
+File format, zlib compressed after the magic: a header, a string table, then
+for each command type its count followed by packed little endian arrays.
+"""
+
+MAGIC = b'DGSC'
+VERSION = 1
+HEADER = struct.Struct('<Hdd')  # version, width, height
+COUNT = struct.Struct('<I')
+BIG_ENDIAN = sys.byteorder == 'big'
+
+
+class Scene:
+    def __init__(self, width: float, height: float, display_list: DisplayList):
+        self.width = width
+        self.height = height
+        self.display_list = display_list
+
+    def render(self, scale: float = 1.0):
+        """Render into a new Pillow image"""
+        from PIL import Image
+        from .pillow_backend import PillowBackend
+
+        size = (max(1, round(self.width * scale)), max(1, round(self.height * scale)))
+        img = Image.new('RGB', size)
+        self.render_with(PillowBackend(img), scale)
+        return img
+
+    def render_with(self, backend, scale: float = 1.0):
+        """Execute the scene on any backend with an execute(display_list)"""
+        display_list = self.display_list if scale == 1 else self.display_list.scaled(scale)
+        backend.execute(display_list)
+        return backend
+
+    def to_bytes(self) -> bytes:
+        groups = self.display_list.groups
+        strings: Dict[str, int] = {}
+
+        def string_id(s):
+            return strings.setdefault(s, len(strings))
+
+        rects = groups[RectangleCommand]
+        lines = groups[LineCommand]
+        arcs = groups[ArcCommand]
+        texts = groups[TextCommand]
+
+        sections = [
+            (rects, array('d', (x for c in rects for x in (*c.top_left, *c.bottom_right)))),
+            (lines, array('d', (x for c in lines for x in (*c.start, *c.end)))),
+            (lines, array('H', (c.width for c in lines))),
+            (arcs, array('d', (x for c in arcs for x in (*c.box, c.start, c.end)))),
+            (texts, array('d', (x for c in texts for x in c.position))),
+            (texts, array('I', (string_id(c.text) for c in texts))),
+            (texts, array('I', (string_id(c.font) for c in texts))),
+            (texts, array('H', (c.size for c in texts))),
+        ]
+
+        body = [HEADER.pack(VERSION, self.width, self.height), COUNT.pack(len(strings))]
+        for s in strings:
+            encoded = s.encode('utf-8')
+            body += [COUNT.pack(len(encoded)), encoded]
+        for commands, values in sections:
+            if BIG_ENDIAN:
+                values.byteswap()  # Stored little endian
+            body += [COUNT.pack(len(commands)), values.tobytes()]
+        return MAGIC + zlib.compress(b''.join(body))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Scene':
+        if data[:4] != MAGIC:
+            raise ValueError('Not a scene file')
+        body = zlib.decompress(data[4:])
+        version, width, height = HEADER.unpack_from(body)
+        if version != VERSION:
+            raise ValueError(f'Unsupported scene version {version}')
+        pos = HEADER.size
+
+        def read_count():
+            nonlocal pos
+            (count,), pos = COUNT.unpack_from(body, pos), pos + COUNT.size
+            return count
+
+        def read_array(typecode, per_command):
+            nonlocal pos
+            count = read_count()
+            values = array(typecode)
+            end = pos + count * per_command * values.itemsize
+            values.frombytes(body[pos:end])
+            if BIG_ENDIAN:
+                values.byteswap()
+            pos = end
+            return values
+
+        strings: List[str] = []
+        for _ in range(read_count()):
+            length = read_count()
+            strings.append(body[pos:pos + length].decode('utf-8'))
+            pos += length
+
+        def points(values, per_command):
+            return [values[i:i + per_command] for i in range(0, len(values), per_command)]
+
+        display_list = DisplayList()
+        groups = display_list.groups
+        groups[RectangleCommand] = [
+            RectangleCommand((x0, y0), (x1, y1)) for x0, y0, x1, y1 in points(read_array('d', 4), 4)
+        ]
+        line_points = points(read_array('d', 4), 4)
+        widths = read_array('H', 1)
+        groups[LineCommand] = [
+            LineCommand((x0, y0), (x1, y1), width)
+            for (x0, y0, x1, y1), width in zip(line_points, widths)
+        ]
+        groups[ArcCommand] = [
+            ArcCommand(tuple(v[:4]), v[4], v[5]) for v in points(read_array('d', 6), 6)
+        ]
+        positions = points(read_array('d', 2), 2)
+        text_ids = read_array('I', 1)
+        font_ids = read_array('I', 1)
+        sizes = read_array('H', 1)
+        groups[TextCommand] = [
+            TextCommand((x, y), strings[text], strings[font], size)
+            for (x, y), text, font, size in zip(positions, text_ids, font_ids, sizes)
+        ]
+        return cls(width, height, display_list)
+
+    def save(self, file: BinaryIO):
+        file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, file: BinaryIO) -> 'Scene':
+        return cls.from_bytes(file.read())
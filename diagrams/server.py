@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import time
+
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from . import renderer
+from .batch import warm_worker
+from .cache import render_bytes
+from .exceptions import SyntaxError, SemanticError
+
+"""
+Local HTTP render service.
+
+    POST /render?format=png|svg   body: DSL text   -> image
+    GET  /metrics                                  -> JSON counters
+
+Renders run in a bounded process pool, off the event loop. Concurrent
+requests for the same document and format share one render. Once
+`max_pending` distinct renders are queued or running, new ones are turned
+away with 503 and a Retry-After header rather than queued without bound.
+"""
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+class Busy(Exception):
+    pass
+
+
+def render_pool(workers: Optional[int] = None, font: str = renderer.RENDERFONT) -> Executor:
+    """Process pool for the server. Workers are spawned rather than forked:
+    forked workers would inherit, and hold open, the client connections"""
+    return ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=warm_worker,
+        initargs=(font,),
+    )
+
+
+class Metrics:
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.renders = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.errors = 0
+        self.pending = 0
+        self.peak_pending = 0
+        self.latencies: Deque[float] = deque(maxlen=window)  # Of renders, in seconds
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def as_dict(self) -> dict:
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 2)
+
+        return {
+            'requests': self.requests,
+            'renders': self.renders,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'queue_depth': self.pending,
+            'peak_queue_depth': self.peak_pending,
+            'latency_ms': {
+                'p50': ms(self.percentile(0.5)),
+                'p95': ms(self.percentile(0.95)),
+                'max': ms(max(self.latencies, default=None)),
+            },
+        }
+
+
+class RenderServer:
+    def __init__(self, executor: Optional[Executor] = None, max_pending: int = 64,
+                 max_body: int = 1024 * 1024):
+        self.executor = executor or render_pool()
+        self.max_pending = max_pending
+        self.max_body = max_body
+        self.metrics = Metrics()
+        self.inflight: Dict[str, asyncio.Future] = {}
+
+    async def render(self, text: str, format: str = 'png') -> bytes:
+        """Rendered document, sharing the render of an identical request
+        already in flight. Raises Busy when the pool is saturated"""
+        key = hashlib.sha256(f'{format}\0{text}'.encode('utf-8')).hexdigest()
+        future = self.inflight.get(key)
+        if future is not None:
+            self.metrics.coalesced += 1
+            # Shielded, a client going away must not cancel the others' render
+            return await asyncio.shield(future)
+
+        if self.metrics.pending >= self.max_pending:
+            self.metrics.rejected += 1
+            raise Busy()
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, render_bytes, text, format)
+        self.inflight[key] = future
+        self.metrics.pending += 1
+        self.metrics.peak_pending = max(self.metrics.peak_pending, self.metrics.pending)
+        start = time.perf_counter()
+
+        def done(_):
+            if not future.cancelled():
+                future.exception()  # Retrieved, even if every client left
+            del self.inflight[key]
+            self.metrics.pending -= 1
+            self.metrics.renders += 1
+            self.metrics.latencies.append(time.perf_counter() - start)
+
+        future.add_done_callback(done)
+        return await asyncio.shield(future)
+
+    async def respond(self, method: str, target: str, body: bytes) -> Tuple[int, str, bytes]:
+        url = urlsplit(target)
+        if url.path == '/metrics':
+            return 200, 'application/json', json.dumps(self.metrics.as_dict()).encode()
+        if url.path != '/render':
+            return 404, 'text/plain', b'Not found\n'
+        if method != 'POST':
+            return 405, 'text/plain', b'Use POST\n'
+
+        format = parse_qs(url.query).get('format', ['png'])[0]
+        if format not in CONTENT_TYPES:
+            return 400, 'text/plain', f'Unknown format {format}\n'.encode()
+        try:
+            data = await self.render(body.decode('utf-8'), format)
+        except Busy:
+            return 503, 'text/plain', b'Too many pending renders\n'
+        except (SyntaxError, SemanticError, UnicodeDecodeError) as e:
+            self.metrics.errors += 1
+            return 400, 'text/plain', f'{type(e).__name__}: {e}\n'.encode()
+        except Exception as e:
+            self.metrics.errors += 1
+            return 500, 'text/plain', f'{type(e).__name__}: {e}\n'.encode()
+        return 200, CONTENT_TYPES[format], data
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One request per connection, HTTP/1.1 without keep alive"""
+        self.metrics.requests += 1
+        try:
+            try:
+                request_line, headers = await read_head(reader)
+                length = int(headers.get('content-length', 0))
+            except ValueError:  # Over long line or non numeric length
+                request_line, length = [], -1
+            if len(request_line) < 2 or length < 0:
+                status, content_type, data = 400, 'text/plain', b'Bad request\n'
+            elif length > self.max_body:
+                status, content_type, data = 413, 'text/plain', b'Document too large\n'
+            else:
+                method, target = request_line[:2]
+                body = await reader.readexactly(length)
+                status, content_type, data = await self.respond(method, target, body)
+
+            head = [
+                f'HTTP/1.1 {status} {REASONS[status]}',
+                f'Content-Type: {content_type}',
+                f'Content-Length: {len(data)}',
+                'Connection: close',
+            ]
+            if status == 503:
+                head.append('Retry-After: 1')
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Client went away
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def read_head(reader: asyncio.StreamReader):
+    """Words of the request line and headers, by lower cased name"""
+    request_line = (await reader.readline()).decode('latin-1').split()
+    headers: Dict[str, str] = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            return request_line, headers
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Serve diagram renders over HTTP')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('-j', '--workers', type=int, help='defaults to the CPU count')
+    arg_parser.add_argument('--max-pending', type=int, default=64)
+    arg_parser.add_argument('--font', default=renderer.RENDERFONT)
+    args = arg_parser.parse_args()
+
+    executor = render_pool(args.workers, args.font)
+    server = RenderServer(executor, args.max_pending)
+    print(f'Serving on http://{args.host}:{args.port}')
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,16 @@
+import abc
+import copy
 import math
 
-from PIL import ImageFont
+from collections import OrderedDict
 
-from utils.geometry import (
+from . import instrument
+from .display import DisplayList, compile_object
+from .text_metrics import measure
+from .utils.geometry import (
     add_points, scale_point,
     negate, rotate_point, distance,
-    intersection_of_lines,
+    half_planes, ray_exit_box, ray_exit_half_planes, ray_exit_rounded_box,
 )
 
 
@@ -39,9 +44,11 @@ class Arc:
 class Arrow:
     type = 'arrow'
 
-    def __init__(self, start, end):
+    def __init__(self, start, end, waypoints=(), heads=None):
         self.start = start
         self.end = end
+        self.waypoints = list(waypoints)  # Bends of the line, in order
+        self.heads = heads  # Precomputed ends of the two head lines
 
     @property
     def center(self):
@@ -52,13 +59,23 @@ class Arrow:
         if hasattr(self, '_primitives'):
             return self._primitives
 
+        points = [self.start, *self.waypoints, self.end]
+        lines = [Line(p1, p2) for p1, p2 in zip(points, points[1:])]
+
+        if self.heads is not None:
+            head1, head2 = self.heads
+            return [*lines, Line(self.end, head1), Line(self.end, head2)]
+
+        # The head points along the last segment
+        last = points[-2]
         arrow_head_length = 7
-        line_dist = distance(self.start, self.end)
-        factor = arrow_head_length / line_dist
+        line_dist = distance(last, self.end)
+        # Zero length arrows, like self loops, get no visible head
+        factor = arrow_head_length / line_dist if line_dist else 0
         # Calculate arrow head lines:
         # - Take a line from end to start, rotate it 30 deg, and clip it
         # - Take a line from end to start, rotate it -30 deg, and clip it
-        origin_shifted = add_points(self.start, negate(self.end))
+        origin_shifted = add_points(last, negate(self.end))
         pos_rotated = rotate_point(origin_shifted, math.pi / 6)
         neg_rotated = rotate_point(origin_shifted, -math.pi / 6)
 
@@ -68,7 +85,7 @@ class Arrow:
         head2 = add_points(self.end, p2)
 
         return [
-            Line(self.start, self.end),  # the main line
+            *lines,  # the main line
             Line(self.end, head1),
             Line(self.end, head2),
         ]
@@ -210,7 +227,98 @@ class RoundedRectangle:
         return [*lines, *arcs]
 
 
-class TextInRectangle:
+class ShapeTemplate:
+    """Geometry of a text shape centered at the origin: its size, draw
+    commands and outline, as a bounding box and as half-planes for clipping.
+    Placed shapes translate it to their center"""
+
+    __slots__ = 'size', 'display_list', 'outline', 'bounds', 'planes'
+
+    def __init__(self, shape):
+        origin = copy.copy(shape)
+        origin.center = (0, 0)
+        origin.__dict__.pop('_primitives', None)
+
+        self.size = shape.size
+        self.display_list = DisplayList(
+            command for obj in origin.primitives for command in compile_object(obj)
+        )
+        self.outline = outline = origin.outline()
+        xs, ys = [x for x, _ in outline], [y for _, y in outline]
+        self.bounds = min(xs), min(ys), max(xs), max(ys)
+        self.planes = half_planes(outline)
+
+    def commands_at(self, center) -> DisplayList:
+        return self.display_list.translated(*center)
+
+
+class TemplateCache:
+    """Shape templates keyed by shape kind, text and style, least recently
+    used ones evicted past `maxsize`"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._templates: OrderedDict = OrderedDict()
+
+    def get(self, shape) -> ShapeTemplate:
+        key = shape.template_key()
+        template = self._templates.get(key)
+        if template is not None:
+            self.hits += 1
+            self._templates.move_to_end(key)
+            return template
+
+        self.misses += 1
+        template = self._templates[key] = ShapeTemplate(shape)
+        if len(self._templates) > self.maxsize:
+            self._templates.popitem(last=False)
+        return template
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self._templates)}
+
+    def clear(self):
+        self._templates.clear()
+        self.hits = self.misses = 0
+
+
+templates = TemplateCache()
+
+
+class TemplatedShape(abc.ABC):
+    """Base of text shapes: draw commands and outline come from the shared
+    template of the shape, translated to its center"""
+
+    @abc.abstractmethod
+    def template_key(self):
+        """Everything the shape's geometry depends on, except its center"""
+
+    @property
+    def template(self) -> ShapeTemplate:
+        return templates.get(self)
+
+    def commands(self):
+        return self.template.commands_at(self.center)
+
+    @abc.abstractmethod
+    def ray_exit(self, dx, dy):
+        """Parameter t at which center + t * (dx, dy) crosses the border"""
+
+    def intersection_from(self, x, y):
+        """Point where the segment from (x, y) to the center crosses the
+        border, the center if (x, y) is inside the shape"""
+        instrument.count('intersection_tests')
+        cx, cy = self.center
+        dx, dy = x - cx, y - cy
+        t = self.ray_exit(dx, dy)
+        if t > 1:
+            return self.center
+        return cx + t * dx, cy + t * dy
+
+
+class TextInRectangle(TemplatedShape):
     type = 'text_in_rectangle'
 
     # TODO: add other params like fill and border, etc
@@ -221,20 +329,27 @@ class TextInRectangle:
         self.padding = padding  # padding with rect
         self.wrap = None if wrap == 0 else wrap  # width of the wrap
 
+    def template_key(self):
+        return type(self), self.text, self.font, self.padding, self.wrap
+
+    @property
+    def size(self):
+        """Width and height of the shape, without computing primitives"""
+        text_size = measure(self.text, self.font)
+        return add_points(text_size, (2 * self.padding, 2 * self.padding))
+
     @property
     def primitives(self):
         if hasattr(self, '_primitives'):
             return self._primitives
 
         # Calculate rectangle and text size
-        font = ImageFont.truetype(self.font)
-        text_size = font.getsize(self.text)
+        text_size = measure(self.text, self.font)  # equivalent to text's top left at origin  # noqa
 
         if self.wrap is not None and text_size[0] > self.wrap:
             # TODO: insert the logic here
             pass
         # No wrap, simple logic
-        text_size = font.getsize(self.text)  # equivalent to text's top left at origin  # noqa
         half_text_size = scale_point(text_size, 0.5)
         text_position = add_points(self.center, negate(half_text_size))
 
@@ -253,19 +368,15 @@ class TextInRectangle:
         ]
         return self._primitives
 
-    def intersection_from(self, x, y):
-        """Calculate border interesection point from given point to center"""
-        centers_line = ((x, y), self.center)
+    def outline(self):
+        """Border polygon, clockwise from the top left corner"""
         [_, rect] = self.primitives
         (a, b) = rect.top_left
         (c, d) = rect.bottom_right
-        # Check with top line
-        intersection = intersection_with_polygon(
-            [(a, b), (c, b), (c, d), (a, d)],
-            centers_line
-        )
-        # If not intersections, return center
-        return intersection or self.center
+        return [(a, b), (c, b), (c, d), (a, d)]
+
+    def ray_exit(self, dx, dy):
+        return ray_exit_box(dx, dy, self.template.bounds)
 
 
 class TextInRoundedRectangle(TextInRectangle):
@@ -277,6 +388,9 @@ class TextInRoundedRectangle(TextInRectangle):
         self.padding = padding  # padding with rect
         self.wrap = None if wrap == 0 else wrap  # width of the wrap
 
+    def template_key(self):
+        return type(self), self.text, self.font, self.padding, self.wrap, self.radius
+
     @property
     def primitives(self):
         if hasattr(self, '_primitives'):
@@ -290,16 +404,12 @@ class TextInRoundedRectangle(TextInRectangle):
         ]
         return self._primitives
 
+    def ray_exit(self, dx, dy):
+        # The outline is the bounding rectangle, corners are clipped as arcs
+        return ray_exit_rounded_box(dx, dy, self.template.bounds, self.radius)
 
-def intersection_with_polygon(points, line):
-    for side in zip(points, points[1:] + [points[0]]):
-        intersection = intersection_of_lines(line, side)
-        if intersection:
-            return intersection
-    return None
 
-
-class TextInParallelogram:
+class TextInParallelogram(TemplatedShape):
     type = 'text_in_parallelogram'
 
     def __init__(self, text, font, center, slide=0, padding=0, wrap=None):
@@ -310,6 +420,16 @@ class TextInParallelogram:
         self.padding = padding
         self.wrap = None if wrap == 0 else wrap
 
+    def template_key(self):
+        return type(self), self.text, self.font, self.padding, self.wrap, self.slide
+
+    @property
+    def size(self):
+        """Width and height of the shape, without computing primitives"""
+        w, h = measure(self.text, self.font)
+        pad = 2 * self.padding
+        return w + pad + 2 * abs(self.slide), h + pad
+
     @property
     def primitives(self):
         if hasattr(self, '_primitives'):
@@ -317,8 +437,7 @@ class TextInParallelogram:
         # No wrap, simple Logic
 
         # Calculate text size
-        font = ImageFont.truetype(self.font)
-        text_size = font.getsize(self.text)  # equivalent to text's top left at origin  # noqa
+        text_size = measure(self.text, self.font)  # equivalent to text's top left at origin  # noqa
         half_text_size = scale_point(text_size, 0.5)
         text_position = add_points(self.center, negate(half_text_size))
 
@@ -334,3 +453,12 @@ class TextInParallelogram:
             ParalleloGram(rect_top_left, rect_bottom_right, self.slide)
         ]
         return self._primitives
+
+    def outline(self):
+        """Border polygon, clockwise from the top left corner"""
+        [_, gram] = self.primitives
+        top, bottom, left, right = gram.primitives
+        return [top.start, top.end, right.end, bottom.start]
+
+    def ray_exit(self, dx, dy):
+        return ray_exit_half_planes(dx, dy, self.template.planes)
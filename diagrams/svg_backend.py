@@ -0,0 +1,103 @@
+import math
+
+from typing import Callable, Dict, TextIO
+from xml.sax.saxutils import escape, quoteattr
+
+from .display import DisplayList, LineCommand, ArcCommand, RectangleCommand, TextCommand, compile_object
+from . import instrument
+
+
+def num(x: float) -> str:
+    """Compact number formatting for coordinates"""
+    return f'{x:.2f}'.rstrip('0').rstrip('.')
+
+
+class SVGBackend:
+    """Writes draw commands as SVG elements to a text stream as they come,
+    without keeping an image, or the commands, in memory.
+
+    Colors match the Pillow backend: white strokes on a black background.
+    """
+
+    def __init__(self, stream: TextIO, width: float, height: float,
+                 background: str = 'black', color: str = 'white'):
+        self.stream = stream
+        self.width = width
+        self.height = height
+        self.background = background
+        self.color = color
+        self.writers: Dict[type, Callable] = {
+            RectangleCommand: self.rectangle,
+            LineCommand: self.line,
+            ArcCommand: self.arc,
+            TextCommand: self.text,
+        }
+
+    def begin(self):
+        w, h = num(self.width), num(self.height)
+        self.stream.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}" '
+            f'viewBox="0 0 {w} {h}">\n'
+            f'<rect width="100%" height="100%" fill={quoteattr(self.background)}/>\n'
+            f'<g fill="none" stroke={quoteattr(self.color)}>\n'
+        )
+
+    def end(self):
+        self.stream.write('</g>\n</svg>\n')
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+
+    def execute(self, display_list: DisplayList):
+        instrument.count('primitives_drawn', len(display_list))
+        for kind, commands in display_list.groups.items():
+            write = self.writers[kind]
+            for command in commands:
+                write(command)
+
+    def draw(self, command):
+        self.writers[type(command)](command)
+
+    def draw_object(self, obj):
+        """Stream the commands of a shape straight from its primitives"""
+        for command in compile_object(obj):
+            self.draw(command)
+
+    def rectangle(self, cmd: RectangleCommand):
+        (x0, y0), (x1, y1) = cmd.top_left, cmd.bottom_right
+        self.stream.write(
+            f'<rect x="{num(x0)}" y="{num(y0)}" '
+            f'width="{num(x1 - x0)}" height="{num(y1 - y0)}"/>\n'
+        )
+
+    def line(self, cmd: LineCommand):
+        (x1, y1), (x2, y2) = cmd.start, cmd.end
+        width = f' stroke-width="{cmd.width}"' if cmd.width != 1 else ''
+        self.stream.write(
+            f'<line x1="{num(x1)}" y1="{num(y1)}" x2="{num(x2)}" y2="{num(y2)}"{width}/>\n'
+        )
+
+    def arc(self, cmd: ArcCommand):
+        # Angles are in degrees, clockwise on screen, as with Pillow
+        x0, y0, x1, y1 = cmd.box
+        cx, cy, r = (x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2
+        start, end = math.radians(cmd.start), math.radians(cmd.end)
+        sweep = (cmd.end - cmd.start) % 360
+        large = 1 if sweep > 180 else 0
+        self.stream.write(
+            f'<path d="M {num(cx + r * math.cos(start))} {num(cy + r * math.sin(start))} '
+            f'A {num(r)} {num(r)} 0 {large} 1 '
+            f'{num(cx + r * math.cos(end))} {num(cy + r * math.sin(end))}"/>\n'
+        )
+
+    def text(self, cmd: TextCommand):
+        x, y = cmd.position
+        self.stream.write(
+            f'<text x="{num(x)}" y="{num(y)}" font-family={quoteattr(cmd.font)} '
+            f'font-size="{cmd.size}" fill={quoteattr(self.color)} stroke="none" '
+            f'dominant-baseline="hanging">{escape(cmd.text)}</text>\n'
+        )
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from .fonts import get_font, DEFAULT_SIZE
+
+Size = Tuple[int, int]
+
+
+class TextMetrics:
+    """Memoized text sizes, keyed by (font, size, text)"""
+
+    def __init__(self, maxsize: int = 4096, font_getter=get_font):
+        self.maxsize = maxsize
+        self.font_getter = font_getter
+        self.hits = 0
+        self.misses = 0
+        self._sizes: OrderedDict = OrderedDict()
+
+    def measure(self, text: str, font: str, size: int = DEFAULT_SIZE) -> Size:
+        key = (font, size, text)
+        text_size = self._sizes.get(key)
+        if text_size is not None:
+            self.hits += 1
+            self._sizes.move_to_end(key)
+            return text_size
+
+        self.misses += 1
+        text_size = self.font_getter(font, size).getsize(text)
+        self._store(key, text_size)
+        return text_size
+
+    def measure_many(
+        self, texts: Iterable[str], font: str, size: int = DEFAULT_SIZE
+    ) -> Dict[str, Size]:
+        """Measure a batch of labels, each distinct label only once"""
+        sizes: Dict[str, Size] = {}
+        face = None
+        for text in texts:
+            if text in sizes:
+                continue
+            key = (font, size, text)
+            text_size = self._sizes.get(key)
+            if text_size is None:
+                face = face or self.font_getter(font, size)
+                text_size = face.getsize(text)
+                self.misses += 1
+                self._store(key, text_size)
+            else:
+                self.hits += 1
+                self._sizes.move_to_end(key)
+            sizes[text] = text_size
+        return sizes
+
+    def _store(self, key, text_size):
+        self._sizes[key] = text_size
+        if len(self._sizes) > self.maxsize:
+            self._sizes.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached': len(self._sizes),
+        }
+
+    def clear(self):
+        self._sizes.clear()
+        self.hits = self.misses = 0
+
+
+metrics = TextMetrics()
+
+
+def measure(text: str, font: str, size: int = DEFAULT_SIZE) -> Size:
+    return metrics.measure(text, font, size)
+
+
+def measure_many(texts: Iterable[str], font: str, size: int = DEFAULT_SIZE):
+    return metrics.measure_many(texts, font, size)
@@ -0,0 +1,91 @@
+import math
+import os
+
+from typing import Iterable, Iterator, List, Tuple
+
+from .display import DisplayList, LineCommand, ArcCommand, RectangleCommand, TextCommand
+from .text_metrics import measure
+from .utils.spatial import UniformGrid
+
+"""
+Tiled rendering. Only the commands intersecting a tile are drawn into it and
+each tile is written out before the next one is drawn, so peak memory depends
+on the tile size rather than the canvas size.
+"""
+
+
+def command_box(cmd) -> Tuple[float, float, float, float]:
+    if isinstance(cmd, LineCommand):
+        (x0, y0), (x1, y1) = cmd.start, cmd.end
+        return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+    if isinstance(cmd, RectangleCommand):
+        return (*cmd.top_left, *cmd.bottom_right)
+    if isinstance(cmd, ArcCommand):
+        return cmd.box
+    if isinstance(cmd, TextCommand):
+        x, y = cmd.position
+        w, h = measure(cmd.text, cmd.font, cmd.size)
+        return x, y, x + w, y + h
+    raise ValueError(f'Unknown draw command {cmd!r}')
+
+
+def render_commands(commands: Iterable, box):
+    """Image of the integer box (x0, y0, x1, y1), x1 and y1 excluded, drawing
+    the given commands in order. They must include every command reaching
+    into the box for its pixels to match those of a full render"""
+    from PIL import Image
+    from .pillow_backend import PillowBackend
+
+    x0, y0, x1, y1 = box
+    img = Image.new('RGB', (math.ceil(x1 - x0), math.ceil(y1 - y0)))
+    PillowBackend(img).execute(DisplayList(commands).translated(-x0, -y0))
+    return img
+
+
+class TileRenderer:
+    """Renders the display list of a scene tile by tile"""
+
+    def __init__(self, scene, tile_size: int = 512):
+        self.scene = scene
+        self.tile_size = tile_size
+        self.columns = math.ceil(scene.width / tile_size)
+        self.rows = math.ceil(scene.height / tile_size)
+
+        # Grid cells are tiles, so each tile looks only at its own cell
+        self.commands: List = list(scene.display_list)
+        self.index = UniformGrid(tile_size)
+        for i, cmd in enumerate(self.commands):
+            # Stroke width pixels may spill over the box edges
+            x0, y0, x1, y1 = command_box(cmd)
+            self.index.insert(i, (x0 - 1, y0 - 1, x1 + 1, y1 + 1))
+
+    def tile_box(self, row: int, column: int):
+        size = self.tile_size
+        x0, y0 = column * size, row * size
+        return (x0, y0, min(x0 + size, self.scene.width), min(y0 + size, self.scene.height))
+
+    def render_tile(self, row: int, column: int):
+        return self.render_box(self.tile_box(row, column))
+
+    def render_box(self, box):
+        """Image of the integer box (x0, y0, x1, y1) of the scene, x1 and y1
+        excluded. Pixels match those of a full render"""
+        x0, y0, x1, y1 = box
+        hits = sorted(self.index.query((x0, y0, x1 - 1, y1 - 1)))
+        return render_commands((self.commands[i] for i in hits), box)
+
+    def tiles(self) -> Iterator[tuple]:
+        """(row, column, image) of every tile, row by row"""
+        for row in range(self.rows):
+            for column in range(self.columns):
+                yield row, column, self.render_tile(row, column)
+
+    def save(self, directory: str, format: str = 'png') -> List[str]:
+        """Write each tile as directory/{row}_{column}.{format}"""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for row, column, img in self.tiles():
+            path = os.path.join(directory, f'{row}_{column}.{format}')
+            img.save(path)
+            paths.append(path)
+        return paths
@@ -0,0 +1,222 @@
+from typing import Dict, List, Optional, Tuple
+
+"""
+Long chains in polynomial time.
+
+Longest simple paths are NP-hard on graphs with cycles, so each strongly
+connected component is condensed into a single vertex weighted by its size and
+the longest path is found on the resulting DAG. That picks the edge the chain
+leaves each component by. Within a component the chain follows a DFS tree
+grown backwards from the node it leaves from, built once per component and
+shared by every node entering it. The last component is left nowhere, so there
+the chain goes to its first node, then on along the deepest branch of the DFS
+tree from that node until it would repeat a node. Chains are always simple
+paths of the graph, though they may skip part of a cycle. On acyclic graphs
+they are exact longest paths.
+"""
+
+
+def strongly_connected_components(adjacents: List[List[int]]) -> List[int]:
+    """Iterative Tarjan's algorithm. Returns the component of every vertex,
+    components are numbered in reverse topological order (sinks first)"""
+    count = len(adjacents)
+    index = [-1] * count
+    lowlink = [0] * count
+    on_stack = [False] * count
+    component = [-1] * count
+    stack: List[int] = []
+    next_index = 0
+    next_component = 0
+
+    for root in range(count):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = lowlink[v] = next_index
+                next_index += 1
+                stack.append(v)
+                on_stack[v] = True
+            else:
+                # Returning from the child adjacents[v][i - 1]
+                child = adjacents[v][i - 1]
+                lowlink[v] = min(lowlink[v], lowlink[child])
+
+            edges = adjacents[v]
+            while i < len(edges):
+                w = edges[i]
+                i += 1
+                if index[w] == -1:
+                    work.append((v, i))
+                    work.append((w, 0))
+                    break
+                if on_stack[w]:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                if lowlink[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component[w] = next_component
+                        if w == v:
+                            break
+                    next_component += 1
+    return component
+
+
+class ChainAnalysis:
+    """Longest chains of a graph, computed once and shared by all queries"""
+
+    def __init__(self, graph):
+        self.ids = [node.id for node in graph.nodes]
+        self.position = position = {id: i for i, id in enumerate(self.ids)}
+        self.adjacents = [
+            [position[adj] for adj in node.adjacents] for node in graph.nodes
+        ]
+        self.component = strongly_connected_components(self.adjacents)
+
+        components = max(self.component, default=-1) + 1
+        self.sizes = sizes = [0] * components
+        for c in self.component:
+            sizes[c] += 1
+
+        members: List[List[int]] = [[] for _ in range(components)]
+        for v, c in enumerate(self.component):
+            members[c].append(v)
+
+        # Components come sinks first, so successors are always done
+        self.length = [0] * components  # Weight of the heaviest chain from component
+        self.exit: Dict[int, Tuple[int, int]] = {}  # Edge into the next component
+        for c in range(components):
+            best, best_exit = 0, None
+            for v in members[c]:
+                for w in self.adjacents[v]:
+                    d = self.component[w]
+                    if d != c and self.length[d] > best:
+                        best, best_exit = self.length[d], (v, w)
+            self.length[c] = sizes[c] + best
+            if best_exit is not None:
+                self.exit[c] = best_exit
+
+        # Vertex each component is left from, or its first vertex for the
+        # components chains end in, and the vertex the next one is entered at
+        self.target = [members[c][0] for c in range(components)]
+        self.next_entry = [-1] * components
+        for c, (v, w) in self.exit.items():
+            self.target[c], self.next_entry[c] = v, w
+
+        # Built lazily, as queries reach them
+        self.predecessors: Optional[List[List[int]]] = None
+        self.toward: Dict[int, Dict[int, int]] = {}  # Next vertex to the target, per component
+        self.branches: Dict[int, List[int]] = {}  # Deepest DFS branch from the target
+        self.paths: Dict[int, List[int]] = {}  # Ids of the chain within the entry's component
+        self.lengths: Dict[int, int] = {}  # Length of the chain from each entry
+
+    def chain_length(self, node_id: int) -> int:
+        entry = self.position[node_id]
+        walked = []
+        while entry != -1 and entry not in self.lengths:
+            c = self.component[entry]
+            walked.append((entry, 1 if self.sizes[c] == 1 else len(self._path(entry))))
+            entry = self.next_entry[c]
+        length = 0 if entry == -1 else self.lengths[entry]
+        for entry, path_length in reversed(walked):
+            length = self.lengths[entry] = length + path_length
+        return length
+
+    def chain(self, node_id: int) -> List[int]:
+        """Node ids of the longest chain starting at the given node. Costs
+        the length of the chain, once the components on it were visited"""
+        ids, component, sizes, next_entry = self.ids, self.component, self.sizes, self.next_entry
+        entry = self.position[node_id]
+        chain: List[int] = []
+        while entry != -1:
+            c = component[entry]
+            if sizes[c] == 1:
+                chain.append(ids[entry])
+            else:
+                chain.extend(self._path(entry))
+            entry = next_entry[c]
+        return chain
+
+    def _path(self, entry: int) -> List[int]:
+        """Ids of the chain within the component entered at entry: along the
+        DFS tree grown backwards from the target of the component, then for
+        the last component on along the deepest branch from its target, up to
+        a vertex already visited"""
+        path = self.paths.get(entry)
+        if path is not None:
+            return path
+
+        c = self.component[entry]
+        target = self.target[c]
+        toward = self.toward.get(c)
+        if toward is None:
+            toward = self.toward[c] = self._tree_to(target)
+        vertices = [entry]
+        v = entry
+        while v != target:
+            v = toward[v]
+            vertices.append(v)
+
+        if self.next_entry[c] == -1:
+            branch = self.branches.get(c)
+            if branch is None:
+                branch = self.branches[c] = self._deepest_branch(target)
+            visited = set(vertices)
+            for v in branch[1:]:
+                if v in visited:
+                    break
+                vertices.append(v)
+
+        path = self.paths[entry] = [self.ids[v] for v in vertices]
+        return path
+
+    def _tree_to(self, target: int) -> Dict[int, int]:
+        """DFS tree of the target's component grown backwards from the
+        target. Maps every other vertex to the next one on its way there"""
+        if self.predecessors is None:
+            self.predecessors = [[] for _ in self.adjacents]
+            for v, edges in enumerate(self.adjacents):
+                for w in edges:
+                    self.predecessors[w].append(v)
+        predecessors = self.predecessors
+
+        c = self.component[target]
+        toward = {target: -1}
+        stack = [(u, target) for u in reversed(predecessors[target])]
+        while stack:
+            v, to_v = stack.pop()
+            if v in toward or self.component[v] != c:
+                continue
+            toward[v] = to_v
+            stack.extend((u, v) for u in reversed(predecessors[v]) if u not in toward)
+        return toward
+
+    def _deepest_branch(self, root: int) -> List[int]:
+        """Path along the DFS tree of the root's component, from the root to
+        its deepest vertex"""
+        c = self.component[root]
+        parent = {root: -1}
+        depth = {root: 0}
+        deepest = root
+        stack = [(w, root) for w in reversed(self.adjacents[root])]
+        while stack:
+            v, from_v = stack.pop()
+            if v in parent or self.component[v] != c:
+                continue
+            parent[v] = from_v
+            depth[v] = depth[from_v] + 1
+            if depth[v] > depth[deepest]:
+                deepest = v
+            stack.extend((w, v) for w in reversed(self.adjacents[v]) if w not in parent)
+
+        v = deepest
+        path = []
+        while v != -1:
+            path.append(v)
+            v = parent[v]
+        path.reverse()
+        return path
@@ -149,3 +149,73 @@ def cramers_rule(params1, params2):
     x = (c1 * b2 - b1 * c2) / (a1 * b2 - b1 * a2)
     y = (a1 * c2 - c1 * a2) / (a1 * b2 - b1 * a2)
     return (x, y)
+
+
+# Ray clipping. Shapes are taken around the origin and rays start from it, so
+# the functions return the parameter t at which the point t * (dx, dy) leaves
+# the shape, inf for a null direction.
+
+def ray_exit_box(dx, dy, box):
+    """Slab test against the box (x0, y0, x1, y1)"""
+    x0, y0, x1, y1 = box
+    t = math.inf
+    if dx > 0:
+        t = x1 / dx
+    elif dx < 0:
+        t = x0 / dx
+    if dy > 0:
+        t = min(t, y1 / dy)
+    elif dy < 0:
+        t = min(t, y0 / dy)
+    return t
+
+
+def ray_exit_rounded_box(dx, dy, box, radius):
+    """Slab test, then the corner circle if the ray leaves beside a corner"""
+    t = ray_exit_box(dx, dy, box)
+    if t == math.inf or radius <= 0:
+        return t
+
+    x0, y0, x1, y1 = box
+    px, py = t * dx, t * dy
+    if px > x1 - radius:
+        ccx = x1 - radius
+    elif px < x0 + radius:
+        ccx = x0 + radius
+    else:
+        return t
+    if py > y1 - radius:
+        ccy = y1 - radius
+    elif py < y0 + radius:
+        ccy = y0 + radius
+    else:
+        return t
+
+    # Larger root of |t * d - c|^2 = r^2, where the ray leaves the circle
+    dd = dx * dx + dy * dy
+    dc = dx * ccx + dy * ccy
+    discriminant = dc * dc - dd * (ccx * ccx + ccy * ccy - radius * radius)
+    return (dc + math.sqrt(max(discriminant, 0))) / dd
+
+
+def half_planes(polygon):
+    """(nx, ny, c) for each side of a convex polygon containing the origin,
+    the polygon being where nx * x + ny * y <= c for all sides"""
+    planes = []
+    for (x0, y0), (x1, y1) in zip(polygon, polygon[1:] + polygon[:1]):
+        nx, ny = y1 - y0, x0 - x1
+        c = nx * x0 + ny * y0
+        if c < 0:  # Normal pointing inwards
+            nx, ny, c = -nx, -ny, -c
+        planes.append((nx, ny, c))
+    return tuple(planes)
+
+
+def ray_exit_half_planes(dx, dy, planes):
+    """Half-plane test against a convex polygon given by half_planes()"""
+    t = math.inf
+    for nx, ny, c in planes:
+        towards = nx * dx + ny * dy
+        if towards > 0:
+            t = min(t, c / towards)
+    return t
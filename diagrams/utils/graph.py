@@ -1,4 +1,4 @@
-from diagrams.graph import Graph, Node
+from ..graph import Graph, Node
 
 from typing import List
 
@@ -14,7 +14,7 @@ def get_node_longest_chain(graph: Graph, node: Node, chain: List[int]) -> List[i
 
         adj_node = graph.get_node(adjacant)
         new_chain = chain + [node.id, adjacant]
-        adj_chain = get_node_longest_chain(graph, adj_node, chain + new_chain)
+        adj_chain = get_node_longest_chain(graph, adj_node, new_chain)
 
         if len(adj_chain) > len(longest_chain):
             longest_chain = [*adj_chain]
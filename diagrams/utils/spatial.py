@@ -0,0 +1,193 @@
+import math
+
+from collections import defaultdict
+from typing import Dict, FrozenSet, Hashable, Iterator, List, Optional, Set, Tuple
+
+Box = Tuple[float, float, float, float]  # x0, y0, x1, y1
+Point = Tuple[float, float]
+
+
+def boxes_intersect(a: Box, b: Box) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def segment_box_entry(p1: Point, p2: Point, box: Box) -> Optional[float]:
+    """Liang-Barsky clip. Returns the parameter in [0, 1] at which the segment
+    enters the box, None if it misses"""
+    (x, y), (ex, ey) = p1, p2
+    dx, dy = ex - x, ey - y
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x - box[0]), (dx, box[2] - x), (-dy, y - box[1]), (dy, box[3] - y)):
+        if p == 0:
+            if q < 0:  # Parallel and outside
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+        if t0 > t1:
+            return None
+    return t0
+
+
+class UniformGrid:
+    """Spatial index of boxes bucketed in square cells. Queries only look at
+    the cells they cover, so they are independent of the number of boxes for
+    evenly spread diagrams"""
+
+    def __init__(self, cell_size: float = 100):
+        self.cell_size = cell_size
+        self.boxes: Dict[Hashable, Box] = {}
+        self.cells: Dict[Tuple[int, int], List[Hashable]] = defaultdict(list)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _cells(self, box: Box) -> Iterator[Tuple[int, int]]:
+        cx0, cy0 = self._cell(box[0], box[1])
+        cx1, cy1 = self._cell(box[2], box[3])
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                yield cx, cy
+
+    def insert(self, key: Hashable, box: Box):
+        if key in self.boxes:
+            self.remove(key)
+        self.boxes[key] = box
+        for cell in self._cells(box):
+            self.cells[cell].append(key)
+
+    def remove(self, key: Hashable):
+        box = self.boxes.pop(key)
+        for cell in self._cells(box):
+            self.cells[cell].remove(key)
+
+    def query(self, box: Box) -> Set[Hashable]:
+        """Keys of the boxes intersecting the given box"""
+        found = set()
+        for cell in self._cells(box):
+            for key in self.cells.get(cell, ()):
+                if key not in found and boxes_intersect(self.boxes[key], box):
+                    found.add(key)
+        return found
+
+    def query_point(self, x: float, y: float) -> Set[Hashable]:
+        return self.query((x, y, x, y))
+
+    def query_segment(self, p1: Point, p2: Point) -> List[Tuple[float, Hashable]]:
+        """(entry parameter, key) of the boxes the segment passes through,
+        nearest to p1 first. Only the cells along the segment are visited"""
+        hits = {}
+        for cell in self._segment_cells(p1, p2):
+            for key in self.cells.get(cell, ()):
+                if key not in hits:
+                    hits[key] = segment_box_entry(p1, p2, self.boxes[key])
+        return sorted(
+            ((t, key) for key, t in hits.items() if t is not None),
+            key=lambda hit: hit[0]
+        )
+
+    def any_in_the_way(self, p1: Point, p2: Point, ignore=()) -> bool:
+        """Whether the segment passes through a box whose key is not ignored.
+        Stops at the first one found, without sorting the hits"""
+        bounds = (min(p1[0], p2[0]), min(p1[1], p2[1]), max(p1[0], p2[0]), max(p1[1], p2[1]))
+        seen = set()
+        for cell in self._segment_cells(p1, p2):
+            for key in self.cells.get(cell, ()):
+                if key in seen or key in ignore:
+                    continue
+                seen.add(key)
+                box = self.boxes[key]
+                if boxes_intersect(bounds, box) and segment_box_entry(p1, p2, box) is not None:
+                    return True
+        return False
+
+    def _segment_cells(self, p1: Point, p2: Point) -> Iterator[Tuple[int, int]]:
+        """Grid traversal of Amanatides and Woo"""
+        size = self.cell_size
+        cx, cy = self._cell(*p1)
+        end = self._cell(*p2)
+        dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # Parameter at which the segment crosses the next cell boundary
+        if dx:
+            next_x = (cx + (step_x > 0)) * size
+            t_max_x, t_delta_x = (next_x - p1[0]) / dx, size / abs(dx)
+        else:
+            t_max_x = t_delta_x = math.inf
+        if dy:
+            next_y = (cy + (step_y > 0)) * size
+            t_max_y, t_delta_y = (next_y - p1[1]) / dy, size / abs(dy)
+        else:
+            t_max_y = t_delta_y = math.inf
+
+        yield cx, cy
+        while (cx, cy) != end and min(t_max_x, t_max_y) <= 1:
+            if t_max_x < t_max_y:
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                cy += step_y
+                t_max_y += t_delta_y
+            yield cx, cy
+
+    def overlapping_pairs(self) -> Set[FrozenSet]:
+        pairs: Set[FrozenSet] = set()
+        for keys in self.cells.values():
+            for i, a in enumerate(keys):
+                for b in keys[i + 1:]:
+                    if boxes_intersect(self.boxes[a], self.boxes[b]):
+                        pairs.add(frozenset((a, b)))
+        return pairs
+
+
+def route_segment(
+    start: Point, end: Point, index: UniformGrid, ignore=(), margin: float = 10, depth: int = 3
+) -> List[Point]:
+    """Points of a polyline from start to end avoiding the boxes in the index,
+    detouring around the corners of the first box in the way. A detour that
+    crosses as many boxes as the straight segment is dropped"""
+    def in_the_way(p1, p2):
+        return [key for _, key in index.query_segment(p1, p2) if key not in ignore]
+
+    blocking = in_the_way(start, end)
+    if not blocking or depth == 0:
+        return [start, end]
+
+    def blocked(p1, p2):
+        return index.any_in_the_way(p1, p2, ignore)
+
+    x0, y0, x1, y1 = index.boxes[blocking[0]]
+    corners = [
+        corner for corner in (
+            (x0 - margin, y0 - margin), (x1 + margin, y0 - margin),
+            (x1 + margin, y1 + margin), (x0 - margin, y1 + margin),
+        )
+        if corner != start and corner != end
+    ]
+
+    def cost(corner):
+        length = (
+            math.hypot(corner[0] - start[0], corner[1] - start[1]) +
+            math.hypot(end[0] - corner[0], end[1] - corner[1])
+        )
+        # Prefer corners from which both legs are clear
+        return (blocked(start, corner) + blocked(corner, end), length)
+
+    corner = min(corners, key=cost)
+    first = route_segment(start, corner, index, ignore, margin, depth - 1)
+    second = route_segment(corner, end, index, ignore, margin, depth - 1)
+    points = [start]
+    for point in first[1:] + second[1:]:
+        if point != points[-1]:
+            points.append(point)
+
+    crossed = set()
+    for p1, p2 in zip(points, points[1:]):
+        crossed.update(in_the_way(p1, p2))
+    if len(crossed) >= len(blocking):
+        return [start, end]
+    return points
@@ -1,8 +1,27 @@
-def string_hash(string):
-    prime = 307  # this is arbritrary prime
-    m = 87178291199  # also arbitrary
-    s = 0
-    for i, chr in enumerate(string):
-        val = ord(chr)
-        s += val * (prime ** i)
-    return s % m
+class SymbolTable:
+    """Interns strings as compact integer ids, two different strings never
+    share an id"""
+    __slots__ = 'ids', 'symbols'
+
+    def __init__(self):
+        self.ids: dict = {}
+        self.symbols: list = []
+
+    def intern(self, symbol: str) -> int:
+        id = self.ids.get(symbol)
+        if id is None:
+            id = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return id
+
+    def symbol(self, id: int) -> str:
+        return self.symbols[id]
+
+    def get(self, symbol: str):
+        return self.ids.get(symbol)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.ids
@@ -0,0 +1,54 @@
+import math
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    try:
+        import numpy as np
+    except ImportError:  # NumPy is optional, callers fall back to scalar geometry
+        np = None
+
+"""
+Batched geometry kernels. Every function works on N items at once, with
+points as arrays of shape (N, 2) and boxes as arrays of shape (N, 4) holding
+x0, y0, x1, y1.
+"""
+
+
+def clip_to_boxes(centers, targets, boxes):
+    """Points where the segments from centers[i] to targets[i] leave boxes[i],
+    assuming each center is inside its box. Targets inside their box give the
+    center, as the segment never crosses the border"""
+    centers = np.asarray(centers, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    boxes = np.asarray(boxes, dtype=float)
+
+    d = targets - centers
+    half = np.stack(
+        [boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]], axis=1
+    ) / 2
+    # Slab test: parameter along d at which each pair of sides is reached
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(d != 0, half / np.abs(d), np.inf).min(axis=1)
+    t = np.where(t < 1, t, 0)
+    return centers + d * t[:, None]
+
+
+def arrow_heads(starts, ends, length: float = 7, angle: float = math.pi / 6):
+    """End points of the two head lines of each arrow, as two (N, 2) arrays.
+    Same construction as shapes.Arrow: the line from end to start, rotated by
+    +/- angle and clipped to length. Zero length arrows, like self loops,
+    get both head lines collapsed onto their end"""
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+
+    back = starts - ends
+    norm = np.hypot(back[:, 0], back[:, 1])
+    factor = length / np.where(norm > 0, norm, np.inf)
+    cos, sin = math.cos(angle), math.sin(angle)
+    x, y = back[:, 0], back[:, 1]
+    pos = np.stack([x * cos - y * sin, y * cos + x * sin], axis=1)
+    neg = np.stack([x * cos + y * sin, y * cos - x * sin], axis=1)
+    return ends + pos * factor[:, None], ends + neg * factor[:, None]
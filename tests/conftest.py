@@ -0,0 +1,16 @@
+import pytest
+
+from diagrams import fonts, shapes, text_metrics
+
+
+@pytest.fixture
+def default_font(monkeypatch):
+    """Draw and measure every font as Pillow's built in bitmap font, so
+    renders need no font files"""
+    from PIL import ImageFont
+
+    font = ImageFont.load_default()
+    monkeypatch.setattr(fonts, 'registry', fonts.FontRegistry(loader=lambda name, size: font))
+    monkeypatch.setattr(text_metrics, 'metrics', text_metrics.TextMetrics())
+    monkeypatch.setattr(shapes, 'templates', shapes.TemplateCache())
+    return font
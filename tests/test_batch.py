@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from diagrams import batch, renderer
+from diagrams.batch import find_inputs, output_path, render_batch, render_file
+
+
+@pytest.fixture
+def documents(tmpdir):
+    tmpdir.join('a.dsl').write('("A") -> ("B")')
+    tmpdir.join('bad.dsl').write('(a -> ')
+    tmpdir.mkdir('sub').join('c.dsl').write('["C"]')
+    tmpdir.join('notes.txt').write('')
+    return tmpdir
+
+
+def test_find_inputs(documents):
+    root = str(documents)
+    assert find_inputs([root]) == [
+        (os.path.join(root, 'a.dsl'), 'a.dsl'),
+        (os.path.join(root, 'bad.dsl'), 'bad.dsl'),
+        (os.path.join(root, 'sub', 'c.dsl'), os.path.join('sub', 'c.dsl')),
+    ]
+    # Globs give file names, and a file found twice is rendered once
+    assert find_inputs([os.path.join(root, '**', 'c.*'), root])[-1] == (
+        os.path.join(root, 'sub', 'c.dsl'), 'c.dsl'
+    )
+    assert find_inputs([os.path.join(root, 'missing*')]) == []
+
+
+def test_output_path():
+    assert output_path('in/a.dsl', 'a.dsl', None, 'png') == 'in/a.png'
+    assert output_path('in/sub/b.dsl', 'sub/b.dsl', 'out', 'svg') == 'out/sub/b.svg'
+
+
+def test_render_batch_reports_failures_and_goes_on(documents, default_font):
+    root = str(documents)
+    out_dir = os.path.join(root, 'out')
+    results = list(render_batch(find_inputs([root]), out_dir, 'svg', workers=1))
+
+    assert [(r.path, r.ok) for r in results] == [
+        (os.path.join(root, 'a.dsl'), True),
+        (os.path.join(root, 'bad.dsl'), False),
+        (os.path.join(root, 'sub', 'c.dsl'), True),
+    ]
+    assert results[1].error.startswith('SyntaxError: ')
+    assert results[1].output is None
+    with open(os.path.join(out_dir, 'sub', 'c.svg')) as f:
+        assert f.read().startswith('<svg ')
+    assert not os.path.exists(os.path.join(out_dir, 'bad.svg'))
+
+
+def test_render_file_reports_any_error(documents, default_font, monkeypatch):
+    def broken(self):
+        raise ZeroDivisionError('float division by zero')
+
+    monkeypatch.setattr(renderer.GraphRenderer, 'compose', broken)
+    monkeypatch.setattr(batch, 'cache', None)
+    result = render_file(str(documents.join('a.dsl')), str(documents.join('a.png')))
+    assert not result.ok
+    assert result.error == 'ZeroDivisionError: float division by zero'
+
+
+def test_render_batch_in_a_pool(documents, default_font):
+    root = str(documents)
+    inputs = find_inputs([root])
+    results = render_batch(inputs, os.path.join(root, 'out'), 'svg', workers=2)
+    assert sorted((r.path, r.ok) for r in results) == [
+        (path, name != 'bad.dsl') for path, name in inputs
+    ]
@@ -0,0 +1,39 @@
+import os
+
+from diagrams.cache import RenderCache
+
+
+def test_render_cache_get_put(tmpdir):
+    cache = RenderCache(str(tmpdir))
+    key = cache.key('(a) -> (b)', {'format': 'png'})
+    assert key != cache.key('(a) -> (b)', {'format': 'svg'})
+    assert key != cache.key('(a) -> (c)', {'format': 'png'})
+
+    assert cache.get(key) is None
+    cache.put(key, b'image')
+    assert cache.get(key) == b'image'
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_render_cache_evicts_least_recently_used(tmpdir):
+    cache = RenderCache(str(tmpdir), max_bytes=25)
+    keys = [cache.key(str(i), {}) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, b'x' * 10)
+        os.utime(cache.path(key), (i, i))
+    cache.get(keys[0])  # Now the most recently used
+
+    cache.put(keys[2], b'x' * 10)
+    assert cache.evictions == 1
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+
+
+def test_render_cache_overwrite_keeps_size(tmpdir):
+    cache = RenderCache(str(tmpdir), max_bytes=25)
+    key = cache.key('a', {})
+    for _ in range(5):
+        cache.put(key, b'x' * 10)
+    assert cache.evictions == 0
+    assert cache._size == 10
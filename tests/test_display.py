@@ -0,0 +1,48 @@
+import math
+
+from types import SimpleNamespace
+
+from diagrams.display import (
+    DisplayList, compile_object,
+    LineCommand, ArcCommand, RectangleCommand, TextCommand,
+)
+
+
+def test_compile_object_flattens_primitives():
+    line = SimpleNamespace(type='line', start=(0, 0), end=(10, 0), width=1)
+    arc = SimpleNamespace(type='arc', center=(5, 5), radius=5, start=0, end=math.pi / 2)
+    text = SimpleNamespace(type='text', position=(1, 2), text='On', font='Ubuntu-R')
+    rect = SimpleNamespace(type='rectangle', top_left=(0, 0), bottom_right=(10, 10))
+    inner = SimpleNamespace(type='rounded_rectangle', primitives=[line, arc])
+    shape = SimpleNamespace(type='text_in_rectangle', primitives=[text, inner, rect])
+
+    assert list(compile_object(shape)) == [
+        TextCommand((1, 2), 'On', 'Ubuntu-R'),
+        LineCommand((0, 0), (10, 0), 1),
+        ArcCommand((0, 0, 10, 10), -90, 0),
+        RectangleCommand((0, 0), (10, 10)),
+    ]
+
+
+def test_display_list_groups_commands():
+    display_list = DisplayList([
+        LineCommand((0, 0), (1, 1)),
+        RectangleCommand((0, 0), (1, 1)),
+        LineCommand((1, 1), (2, 2)),
+    ])
+    assert len(display_list) == 3
+    assert display_list.groups[LineCommand] == [
+        LineCommand((0, 0), (1, 1)), LineCommand((1, 1), (2, 2))
+    ]
+    assert list(display_list)[0] == RectangleCommand((0, 0), (1, 1))
+
+
+def test_display_list_translated():
+    display_list = DisplayList([
+        LineCommand((0, 0), (1, 1)),
+        ArcCommand((0, 0, 10, 10), 0, 90),
+        TextCommand((1, 2), 'On', 'Ubuntu-R'),
+    ]).translated(-5, 10)
+    assert display_list.groups[LineCommand] == [LineCommand((-5, 10), (-4, 11))]
+    assert display_list.groups[ArcCommand] == [ArcCommand((-5, 10, 5, 20), 0, 90)]
+    assert display_list.groups[TextCommand] == [TextCommand((-4, 12), 'On', 'Ubuntu-R')]
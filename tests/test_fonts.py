@@ -0,0 +1,28 @@
+from diagrams.fonts import FontRegistry
+
+
+def fake_loader(name, size):
+    return (name, size)
+
+
+def test_font_loaded_once():
+    registry = FontRegistry(loader=fake_loader)
+    assert registry.get('Ubuntu-R') == ('Ubuntu-R', 10)
+    assert registry.get('Ubuntu-R') == ('Ubuntu-R', 10)
+    assert registry.get('Ubuntu-R', 12) == ('Ubuntu-R', 12)
+    assert registry.stats() == {
+        'hits': 1, 'misses': 2, 'evictions': 0, 'loaded': 2
+    }
+
+
+def test_least_recently_used_evicted():
+    registry = FontRegistry(maxsize=2, loader=fake_loader)
+    registry.get('A')
+    registry.get('B')
+    registry.get('A')
+    registry.get('C')  # Evicts B, as A was used more recently
+
+    assert ('A', 10) in registry
+    assert ('B', 10) not in registry
+    assert ('C', 10) in registry
+    assert registry.evictions == 1
@@ -0,0 +1,19 @@
+from diagrams.graph import CompactGraph
+from diagrams.utils.strings import SymbolTable
+
+
+def test_compact_graph_from_links():
+    symbols = SymbolTable()
+    a, b, c = (symbols.intern(x) for x in ('a', 'b', '"c"'))
+    vars = {a: 'Off State', b: 'On State', c: 'c'}
+    links = {('(', a): [('[', b), ('(', c)], ('[', b): [('(', c)]}
+
+    graph = CompactGraph.from_links(vars, links, symbols)
+
+    assert len(graph.nodes) == 3
+    assert [n.value for n in graph.nodes] == ['Off State', 'On State', 'c']
+    assert [n.type for n in graph.nodes] == ['(', '[', '(']
+    assert graph.get_node(0).varname == 'a'
+    assert list(graph.get_node(0).adjacents) == [1, 2]
+    assert list(graph.get_node(1).adjacents) == [2]
+    assert list(graph.neighbours(2)) == []
@@ -0,0 +1,41 @@
+from diagrams import instrument
+
+
+def test_stage_and_count_do_nothing_when_disabled():
+    assert instrument.recorder is None
+    with instrument.stage('parse'):
+        pass
+    instrument.count('primitives_drawn', 3)
+    assert instrument.stage('parse') is instrument.NO_STAGE
+
+
+def test_recording_collects_stages_and_counters():
+    with instrument.recording() as stats:
+        with instrument.stage('parse'):
+            pass
+        with instrument.stage('parse'):
+            pass
+        instrument.count('primitives_drawn', 3)
+        instrument.count('primitives_drawn')
+    assert instrument.recorder is None
+
+    report = stats.as_dict()
+    assert report['stages']['parse']['calls'] == 2
+    assert report['stages']['parse']['seconds'] >= 0
+    assert report['counters']['primitives_drawn'] == 4
+
+
+def test_custom_recorder():
+    events = []
+
+    class Recorder:
+        def stage(self, name, seconds):
+            events.append(name)
+
+        def count(self, name, n):
+            events.append((name, n))
+
+    with instrument.recording(Recorder()):
+        with instrument.stage('draw'):
+            instrument.count('primitives_drawn', 2)
+    assert events == [('primitives_drawn', 2), 'draw']
@@ -0,0 +1,54 @@
+from diagrams.graph import Graph, Node
+from diagrams.layout import Channels, layered_layout, acyclic_adjacents, assign_layers
+
+
+def test_acyclic_adjacents():
+    # 0 -> 1 -> 2 -> 0 and a self loop on 1
+    acyclic = acyclic_adjacents([[1], [1, 2], [0]])
+    assert acyclic == [[1, 2], [2], []]  # 2 -> 0 reversed
+    assert assign_layers(acyclic) == [0, 1, 2]
+
+
+def layout_abcd():
+    a, b, c, d = nodes = [Node(x, x, '[') for x in 'abcd']
+    a.adjacents = [b.id, c.id]
+    b.adjacents = [d.id]
+    c.adjacents = [d.id]
+    d.adjacents = [a.id]  # Cycle back to top
+
+    sizes = {a.id: (100, 30), b.id: (60, 30), c.id: (80, 50), d.id: (40, 30)}
+    layout = layered_layout(Graph(nodes), sizes, h_gap=40, v_gap=60, margin=20)
+    boxes = {}
+    for id, (x, y) in layout.centers.items():
+        w, h = sizes[id]
+        boxes[id] = (x - w / 2, y - h / 2, x + w / 2, y + h / 2)
+    return nodes, layout, boxes
+
+
+def test_layered_layout():
+    (a, b, c, d), layout, _ = layout_abcd()
+
+    assert layout.layers == [[a.id], [b.id, c.id], [d.id]]
+    assert layout.width == 60 + 40 + 80 + 2 * 20
+    assert layout.height == 30 + 50 + 30 + 2 * 60 + 2 * 20
+    assert layout.centers[a.id] == (110, 35)
+    assert layout.centers[b.id] == (50, 135)
+    assert layout.centers[c.id] == (160, 135)
+    assert layout.centers[d.id] == (110, 235)
+
+
+def test_channels():
+    (a, b, c, d), layout, boxes = layout_abcd()
+    channels = Channels(layout, boxes, clearance=10)
+    # b spans x 20 to 80 and c 120 to 200 on the layer at y 110 to 160
+    assert channels.gap_y(1) == 80 and channels.gap_y(2) == 190
+    assert channels.gap_y(0) == 10 and channels.gap_y(3) == 260
+    assert channels.free_x(1, 110) == 110
+    assert channels.free_x(1, 50) == 10
+    assert channels.free_x(1, 150) == 100  # Middle of the gap between b and c
+    assert channels.free_x(1, 195) == 210
+
+    assert channels.waypoints(a.id, d.id) == [(110, 80), (110, 190)]
+    assert channels.waypoints(d.id, a.id) == [(110, 190), (110, 80)]
+    assert channels.waypoints(b.id, c.id) == [(50, 190), (160, 190)]
+    assert channels.region(a.id, b.id) == (20, 20, 200, 250)
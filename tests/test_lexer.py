@@ -0,0 +1,32 @@
+from diagrams.lexer import tokenize, IDENT, STRING, BRACE, DEFINE, LINK, UNKNOWN, EOF
+
+
+def kinds(line):
+    return [(t.kind, t.value, t.col) for t in tokenize(line)]
+
+
+def test_tokenize_declaration():
+    assert kinds('a := "On State"  # comment') == [
+        (IDENT, 'a', 0),
+        (DEFINE, ':=', 2),
+        (STRING, '"On State"', 5),
+        (EOF, '', 15),
+    ]
+
+
+def test_tokenize_chain():
+    assert kinds('(a)->["b#c"] <- <d>') == [
+        (BRACE, '(', 0), (IDENT, 'a', 1), (BRACE, ')', 2),
+        (LINK, '->', 3),
+        (BRACE, '[', 5), (STRING, '"b#c"', 6), (BRACE, ']', 11),
+        (LINK, '<-', 13),
+        (BRACE, '<', 16), (IDENT, 'd', 17), (BRACE, '>', 18),
+        (EOF, '', 19),
+    ]
+
+
+def test_tokenize_unknown():
+    assert kinds('a1 "open') == [
+        (IDENT, 'a', 0), (UNKNOWN, '1', 1), (UNKNOWN, '"open', 3), (EOF, '', 8)
+    ]
+    assert kinds('') == [(EOF, '', 0)]
@@ -0,0 +1,141 @@
+import io
+import re
+import subprocess
+import sys
+
+import pytest
+
+from diagrams.exceptions import SyntaxError, SemanticError
+from diagrams.parser import ParseSession, merge_chunks, parse, parse_chunk, parse_parallel, parse_stream
+
+DOCUMENT = '''# States
+a := "Off State"
+b := "On State"
+
+(a) -> [b] -> ("Done")
+(a) <- [b]
+'''
+
+
+def test_parse_builds_nodes_and_links():
+    graph = parse(DOCUMENT)
+    nodes = {(node.type, node.varname): node for node in graph.nodes}
+
+    assert set(nodes) == {('(', 'a'), ('[', 'b'), ('(', '"Done"')}
+    assert nodes[('(', 'a')].value == 'Off State'
+    assert nodes[('(', '"Done"')].value == 'Done'
+    assert nodes[('(', 'a')].adjacents == [nodes[('[', 'b')].id]
+    assert nodes[('[', 'b')].adjacents == [nodes[('(', '"Done"')].id, nodes[('(', 'a')].id]
+
+
+def test_parse_compact_matches_graph():
+    graph, compact = parse(DOCUMENT), parse(DOCUMENT, compact=True)
+    assert [n.value for n in compact.nodes] == [n.value for n in graph.nodes]
+
+
+def test_parse_errors():
+    with pytest.raises(SyntaxError, match='Line 2, Col 1'):
+        parse('a := "A"\n(a -> ')
+    with pytest.raises(SemanticError, match="variable 'c' not defined"):
+        parse('(c) -> ("A")')
+    with pytest.raises(SemanticError, match='already defined'):
+        parse('a := "A"\na := "B"')
+
+
+def test_parse_stream_reads_file_objects():
+    def links(graph):
+        values = {node.id: node.value for node in graph.nodes}
+        return [(node.value, [values[id] for id in node.adjacents]) for node in graph.nodes]
+
+    assert links(parse_stream(io.StringIO(DOCUMENT))) == links(parse(DOCUMENT))
+
+    with pytest.raises(SyntaxError, match='Line 2, Col 1'):
+        parse_stream(iter(['a := "A"', '(a -> ']))
+
+
+def graph_shape(graph):
+    nodes = {node.id: node for node in graph.nodes}
+    return [
+        (node.type, node.varname, node.value, [nodes[id].varname for id in node.adjacents])
+        for node in graph.nodes
+    ]
+
+
+def test_parse_parallel_keeps_line_order():
+    document = DOCUMENT + '\n'.join(f'("{i}") -> (a) -> ("{i % 3}")' for i in range(20))
+    graph = parse_parallel(document, workers=2, chunk_size=4)
+    assert graph_shape(graph) == graph_shape(parse(document))
+
+    with pytest.raises(SemanticError, match='Line 27'):
+        parse_parallel(document + '\na := "Again"', workers=2, chunk_size=4)
+
+
+@pytest.mark.parametrize('document', [
+    'a := "A"\n(a) -> ("B")\n\n(a -> \n[b]',
+    'a := "A"\n(a) -> ("B")\na := "C"\n(a -> ',
+    'a := "A"\n(a) -> ("B")\n(a -> \na := "C"',
+    'a := "A"\n(a) -> ("B")\nb := "B"\nb := "C"',
+    'a := "A"\n(a) -> ("B")\n(c) -> (a)\n(d) -> (a)',
+])
+def test_merged_chunks_raise_the_first_serial_error(document):
+    with pytest.raises((SyntaxError, SemanticError)) as expected:
+        parse(document)
+
+    lines = document.split('\n')
+    chunks = (parse_chunk(lines[i:i + 2], i) for i in range(0, len(lines), 2))
+    with pytest.raises(expected.type, match=re.escape(str(expected.value))):
+        merge_chunks(chunks).graph()
+
+
+def test_parse_session_only_parses_edited_lines():
+    session = ParseSession()
+    session.update(DOCUMENT)
+    parsed = session.parsed_lines
+
+    graph = session.update(DOCUMENT.replace('"On State"', '"On"'))
+    assert session.parsed_lines == parsed + 1
+    assert sorted(n.value for n in graph.nodes) == ['Done', 'Off State', 'On']
+
+
+def test_parse_session_matches_parse():
+    session = ParseSession()
+    first = session.update(DOCUMENT)
+    first_shape = graph_shape(first)
+    edits = [
+        DOCUMENT,
+        DOCUMENT.replace('(a) <- [b]', '(a) <- [b] <- ("Start")'),
+        '("Start") -> (a)\n' + DOCUMENT,
+        DOCUMENT.replace('"Off State"', '"Off"').replace('(a) -> [b]', '[b] -> (a)'),
+        DOCUMENT + '\n(a) -> ("Done")',
+        'b := "On State"\n[b] -> ("Done")',
+        '',
+        DOCUMENT,
+    ]
+    for document in edits:
+        assert graph_shape(session.update(document)) == graph_shape(parse(document))
+    # Graphs handed out are not changed by later updates
+    assert graph_shape(first) == first_shape
+
+
+@pytest.mark.parametrize('edit', [
+    'a := "A"\n(a -> ',
+    '(c) -> ("A")',
+    'a := "A"\na := "B"',
+])
+def test_parse_session_errors_match_parse(edit):
+    document = DOCUMENT + edit
+    with pytest.raises((SyntaxError, SemanticError)) as expected:
+        parse(document)
+
+    session = ParseSession()
+    session.update(DOCUMENT)
+    with pytest.raises(expected.type, match=re.escape(str(expected.value))):
+        session.update(document)
+    # And recovers once the error is edited away
+    assert len(session.update(DOCUMENT).nodes) == 3
+
+
+def test_parser_import_does_not_load_pillow():
+    code = 'import sys, diagrams.parser; print(any(m.startswith("PIL") for m in sys.modules))'
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.strip() == b'False'
@@ -0,0 +1,93 @@
+import pytest
+
+from diagrams import instrument
+from diagrams.parser import parse
+from diagrams.renderer import GraphRenderer, merge_boxes
+from diagrams.utils import vectorized
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_each_arrow_end_clipped_once(default_font, monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(vectorized, 'np', None)
+
+    with instrument.recording() as stats:
+        GraphRenderer(parse('["A"] -> ("B") -> <"C">')).compose()
+    assert stats.counters['intersection_tests'] == 4
+
+
+DOCUMENT = '''a := "Off State"
+b := "On State"
+(a) -> [b] -> <"Done">
+(a) <- [b]
+["Idle"] -> (a)
+["Idle"] -> <"Done">
+'''
+
+
+@pytest.mark.parametrize('edit', [
+    ('"On State"', '"On Stage"'),
+    ('"On State"', '"A much longer state"'),
+    ('(a) <- [b]\n', '(a) <- [b]\n[b] -> ["Idle"]\n'),
+    ('["Idle"] -> <"Done">\n', ''),
+    ('(a)', '/a/'),
+])
+def test_update_matches_a_full_render(default_font, edit):
+    from PIL import ImageChops
+
+    edited = DOCUMENT.replace(*edit)
+    renderer = GraphRenderer(parse(DOCUMENT))
+    renderer.render()
+    renderer.update(parse(edited))
+
+    full = GraphRenderer(parse(edited)).render()
+    assert renderer.img.size == full.size
+    assert ImageChops.difference(renderer.img, full).getbbox() is None
+
+    # And back, through the index of the drawn items kept by the first update
+    renderer.update(parse(DOCUMENT))
+    full = GraphRenderer(parse(DOCUMENT)).render()
+    assert ImageChops.difference(renderer.img, full).getbbox() is None
+
+
+def test_update_reuses_unchanged_items(default_font):
+    renderer = GraphRenderer(parse(DOCUMENT))
+    renderer.render()
+    items = renderer.items
+    boxes = renderer.update(parse(DOCUMENT.replace('"On State"', '"On Stage"')))
+
+    b = ('[', 'b')
+    assert renderer.items[b] != items[b]
+    assert renderer.items[('(', 'a')] is items[('(', 'a')]
+    link = ('link', ('[', '"Idle"'), ('(', 'a'))
+    assert renderer.items[link] is items[link]
+    repainted = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes)
+    assert repainted < renderer.width * renderer.height
+    assert renderer.update(renderer.graph) == []
+
+
+def test_fan_out_arrows_miss_their_siblings(default_font):
+    children = [f'["child {i}"]' for i in range(12)]
+    renderer = GraphRenderer(parse('\n'.join(f'("root") -> {child}' for child in children)))
+    renderer.compose()
+    assert len(renderer.layout.layers[1]) == 12
+
+    bent = 0
+    for (source, dest), arrow in zip(renderer.pending_links,
+                                     renderer.create_arrows(renderer.pending_links)):
+        points = [arrow.start, *arrow.waypoints, arrow.end]
+        bent += bool(arrow.waypoints)
+        for p1, p2 in zip(points, points[1:]):
+            assert p1 != p2
+            assert not renderer.index.any_in_the_way(p1, p2, ignore=(source, dest))
+    assert bent  # The straight lines to the far children cross their siblings
+
+
+def test_merge_boxes():
+    assert merge_boxes([(0, 0, 10, 10), (20, 20, 30, 30)]) == [(0, 0, 10, 10), (20, 20, 30, 30)]
+    assert merge_boxes([(0, 0, 10, 10), (5, 5, 15, 15)]) == [(0, 0, 15, 15)]
+    # A box bridging two merged ones absorbs both
+    merged = merge_boxes([(0, 0, 10, 10), (20, 0, 30, 10), (8, 0, 22, 5)])
+    assert merged == [(0, 0, 30, 10)]
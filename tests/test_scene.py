@@ -0,0 +1,28 @@
+import io
+
+import pytest
+
+from diagrams.display import DisplayList, LineCommand, ArcCommand, RectangleCommand, TextCommand
+from diagrams.scene import Scene
+
+
+def test_scene_round_trip():
+    display_list = DisplayList([
+        RectangleCommand((0.5, 1), (10, 20)),
+        LineCommand((0, 0), (3.25, 4), 2),
+        ArcCommand((0, 0, 10, 10), -90, 0),
+        TextCommand((1, 2), 'Off État', 'Ubuntu-R'),
+        TextCommand((3, 4), 'On', 'Ubuntu-R', 12),
+    ])
+    file = io.BytesIO()
+    Scene(100, 50.5, display_list).save(file)
+    file.seek(0)
+    scene = Scene.load(file)
+
+    assert (scene.width, scene.height) == (100, 50.5)
+    assert scene.display_list.groups == display_list.groups
+
+
+def test_scene_rejects_other_files():
+    with pytest.raises(ValueError):
+        Scene.from_bytes(b'PNG...')
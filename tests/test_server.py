@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+from concurrent.futures import Executor, Future
+
+import pytest
+
+from diagrams.server import Busy, RenderServer
+
+
+class ManualExecutor(Executor):
+    """Executor whose jobs run only when the test finishes them"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.jobs.append((future, args))
+        return future
+
+    def finish(self, result=b'image'):
+        for future, _ in self.jobs:
+            if not future.done():
+                future.set_result(result)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_identical_requests_share_one_render():
+    async def scenario():
+        executor = ManualExecutor()
+        server = RenderServer(executor)
+        requests = [asyncio.ensure_future(server.render('(a) -> (b)')) for _ in range(3)]
+        other = asyncio.ensure_future(server.render('(a) -> (b)', 'svg'))
+        await asyncio.sleep(0)
+        executor.finish()
+        return executor, server, await asyncio.gather(*requests, other)
+
+    executor, server, results = run(scenario())
+    assert results == [b'image'] * 4
+    assert [args for _, args in executor.jobs] == [('(a) -> (b)', 'png'), ('(a) -> (b)', 'svg')]
+    assert (server.metrics.renders, server.metrics.coalesced) == (2, 2)
+    assert server.inflight == {} and server.metrics.pending == 0
+
+
+def test_saturated_pool_turns_requests_away():
+    async def scenario():
+        executor = ManualExecutor()
+        server = RenderServer(executor, max_pending=1)
+        first = asyncio.ensure_future(server.render('(a)'))
+        await asyncio.sleep(0)
+        with pytest.raises(Busy):
+            await server.render('(b)')
+        status, _, _ = await server.respond('POST', '/render', b'(b)')
+        # Coalesced requests are not turned away
+        shared = asyncio.ensure_future(server.render('(a)'))
+        await asyncio.sleep(0)
+        executor.finish()
+        await asyncio.gather(first, shared)
+        return server, status
+
+    server, status = run(scenario())
+    assert status == 503
+    assert server.metrics.rejected == 2
+    assert server.metrics.peak_pending == 1
+
+
+def test_metrics_endpoint():
+    async def scenario():
+        executor = ManualExecutor()
+        server = RenderServer(executor)
+        pending = asyncio.ensure_future(server.respond('POST', '/render?format=svg', b'(a)'))
+        await asyncio.sleep(0)
+        executor.finish(b'<svg/>')
+        rendered = await pending
+        return rendered, await server.respond('GET', '/metrics', b'')
+
+    rendered, (status, content_type, body) = run(scenario())
+    assert rendered == (200, 'image/svg+xml', b'<svg/>')
+    assert (status, content_type) == (200, 'application/json')
+    metrics = json.loads(body)
+    assert metrics['renders'] == 1 and metrics['queue_depth'] == 0
+    assert metrics['latency_ms']['p50'] is not None
+
+
+def test_bad_requests():
+    server = RenderServer(ManualExecutor())
+    assert run(server.respond('GET', '/render', b''))[0] == 405
+    assert run(server.respond('POST', '/render?format=gif', b''))[0] == 400
+    assert run(server.respond('GET', '/other', b''))[0] == 404
+
+
+def test_busy_response_asks_to_retry():
+    async def scenario():
+        executor = ManualExecutor()
+        server = RenderServer(executor, max_pending=0)
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'POST /render HTTP/1.1\r\nContent-Length: 3\r\n\r\n(a)')
+        response = await reader.read()
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return response
+
+    head, _, body = run(scenario()).partition(b'\r\n\r\n')
+    assert head.split(b'\r\n')[0] == b'HTTP/1.1 503 Service Unavailable'
+    assert b'Retry-After: 1' in head.split(b'\r\n')
+    assert body == b'Too many pending renders\n'
+
+
+@pytest.mark.parametrize('length', [b'abc', b'-3', b''])
+def test_invalid_content_length(length):
+    async def scenario():
+        server = RenderServer(ManualExecutor())
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'POST /render HTTP/1.1\r\nContent-Length: ' + length + b'\r\n\r\n(a)')
+        response = await reader.read()
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return response
+
+    head, _, body = run(scenario()).partition(b'\r\n\r\n')
+    assert head.split(b'\r\n')[0] == b'HTTP/1.1 400 Bad Request'
+    assert body == b'Bad request\n'
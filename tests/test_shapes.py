@@ -0,0 +1,67 @@
+import pytest
+
+from diagrams import shapes, text_metrics
+from diagrams.display import compile_object
+
+
+class FakeFont:
+    def getsize(self, text):
+        return 6 * len(text), 10
+
+
+@pytest.fixture(autouse=True)
+def fake_metrics(monkeypatch):
+    monkeypatch.setattr(
+        text_metrics, 'metrics', text_metrics.TextMetrics(font_getter=lambda name, size: FakeFont())
+    )
+    monkeypatch.setattr(shapes, 'templates', shapes.TemplateCache())
+
+
+def primitive_commands(shape):
+    return sorted(command for obj in shape.primitives for command in compile_object(obj))
+
+
+@pytest.mark.parametrize('make', [
+    lambda center: shapes.TextInRectangle('On', 'font', center, 20),
+    lambda center: shapes.TextInRoundedRectangle('On', 'font', center, 20, radius=5),
+    lambda center: shapes.TextInParallelogram('On', 'font', center, -15, 20),
+])
+def test_placed_shapes_share_a_template(make):
+    first, second = make((50, 40)), make((200, 100))
+
+    assert sorted(compile_object(first)) == primitive_commands(first)
+    assert sorted(compile_object(second)) == primitive_commands(second)
+    assert shapes.templates.stats() == {'hits': 1, 'misses': 1, 'cached': 1}
+
+
+def test_templates_are_keyed_by_style():
+    shapes.TextInRectangle('On', 'font', (0, 0), 20).template
+    shapes.TextInRectangle('On', 'font', (0, 0), 10).template
+    shapes.TextInRoundedRectangle('On', 'font', (0, 0), 20).template
+    assert shapes.templates.stats()['misses'] == 3
+
+
+def test_intersection_from():
+    rect = shapes.TextInRectangle('On', 'font', (100, 100), 20)  # 52 x 50
+    assert rect.intersection_from(100, 0) == (100, 75)
+    assert rect.intersection_from(152, 150) == (126, 125)
+    assert rect.intersection_from(110, 110) == (100, 100)  # Inside
+
+    rounded = shapes.TextInRoundedRectangle('On', 'font', (100, 100), 20, radius=5)
+    assert rounded.intersection_from(0, 100) == (74, 100)
+    # Corner circle centered at (121, 120) relative to the shape center
+    assert rounded.intersection_from(200, 200) == pytest.approx((124, 124))
+
+    gram = shapes.TextInParallelogram('On', 'font', (100, 100), -15, 20)
+    assert gram.intersection_from(100, 200) == (100, 125)
+    # Left side goes from (59, 75) down to (74, 125)
+    assert gram.intersection_from(0, 100) == pytest.approx((66.5, 100))
+
+
+def test_templated_shapes_must_define_a_template_key():
+    class Keyless(shapes.TemplatedShape):
+        def ray_exit(self, dx, dy):
+            return 1
+
+    with pytest.raises(TypeError):
+        Keyless()
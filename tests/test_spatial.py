@@ -0,0 +1,62 @@
+from diagrams.utils.spatial import UniformGrid, route_segment, segment_box_entry
+
+
+def make_grid():
+    grid = UniformGrid(cell_size=50)
+    grid.insert('a', (0, 0, 40, 20))
+    grid.insert('b', (100, 0, 140, 20))
+    grid.insert('c', (30, 10, 60, 30))  # Overlaps a
+    return grid
+
+
+def test_query():
+    grid = make_grid()
+    assert grid.query_point(10, 10) == {'a'}
+    assert grid.query_point(35, 15) == {'a', 'c'}
+    assert grid.query_point(80, 10) == set()
+    assert grid.query((90, -10, 200, 5)) == {'b'}
+    assert grid.overlapping_pairs() == {frozenset(('a', 'c'))}
+
+    grid.remove('c')
+    assert grid.overlapping_pairs() == set()
+
+
+def test_query_segment():
+    grid = make_grid()
+    assert segment_box_entry((-10, 10), (10, 10), (0, 0, 40, 20)) == 0.5
+    assert segment_box_entry((-10, 30), (10, 30), (0, 0, 40, 20)) is None
+
+    hits = grid.query_segment((-20, 5), (200, 5))
+    assert [key for _, key in hits] == ['a', 'b']
+    assert grid.query_segment((0, 100), (200, 100)) == []
+
+
+def test_route_segment():
+    grid = UniformGrid(cell_size=50)
+    grid.insert('obstacle', (40, -10, 60, 10))
+
+    assert route_segment((0, 50), (100, 50), grid) == [(0, 50), (100, 50)]
+
+    points = route_segment((0, 0), (100, 0), grid, margin=5)
+    assert points[0] == (0, 0) and points[-1] == (100, 0)
+    assert len(points) > 2
+    for p1, p2 in zip(points, points[1:]):
+        assert p1 != p2
+        assert grid.query_segment(p1, p2) == []
+
+
+def test_route_segment_never_worse_than_straight():
+    # A wall too long to get around within the depth
+    grid = UniformGrid(cell_size=50)
+    for i in range(10):
+        grid.insert(i, (40, i * 30 - 150, 60, i * 30 - 120))
+    assert route_segment((0, 15), (100, 15), grid, margin=5, depth=2) == [(0, 15), (100, 15)]
+
+
+def test_any_in_the_way():
+    grid = make_grid()
+    assert grid.any_in_the_way((-20, 5), (200, 5))
+    assert not grid.any_in_the_way((-20, 5), (200, 5), ignore=('a', 'b'))
+    assert grid.any_in_the_way((-20, 15), (200, 15), ignore=('a', 'b'))  # Through c
+    assert not grid.any_in_the_way((70, 0), (90, 40))
+    assert not grid.any_in_the_way((0, 100), (200, 100))
@@ -0,0 +1,29 @@
+import io
+
+from diagrams.display import DisplayList, LineCommand, ArcCommand, RectangleCommand, TextCommand
+from diagrams.svg_backend import SVGBackend, num
+
+
+def test_num():
+    assert num(1.0) == '1'
+    assert num(1.5) == '1.5'
+    assert num(1.23456) == '1.23'
+
+
+def test_svg_backend_writes_elements():
+    stream = io.StringIO()
+    with SVGBackend(stream, 100, 50) as svg:
+        svg.execute(DisplayList([
+            RectangleCommand((0, 0), (10, 20)),
+            LineCommand((0, 0), (5, 5), 2),
+            ArcCommand((0, 0, 10, 10), 0, 90),
+            TextCommand((1, 2), 'A & B', 'Ubuntu-R'),
+        ]))
+    svg = stream.getvalue()
+
+    assert svg.startswith('<svg xmlns="http://www.w3.org/2000/svg" width="100" height="50"')
+    assert '<rect x="0" y="0" width="10" height="20"/>' in svg
+    assert '<line x1="0" y1="0" x2="5" y2="5" stroke-width="2"/>' in svg
+    assert '<path d="M 10 5 A 5 5 0 0 1 5 10"/>' in svg
+    assert '>A &amp; B</text>' in svg
+    assert svg.endswith('</svg>\n')
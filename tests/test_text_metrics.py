@@ -0,0 +1,63 @@
+from diagrams.text_metrics import TextMetrics
+
+
+class FakeFont:
+    def __init__(self, size):
+        self.size = size
+
+    def getsize(self, text):
+        return self.size * len(text), self.size
+
+
+class FontGetter:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, name, size):
+        self.calls.append((name, size))
+        return FakeFont(size)
+
+
+def test_measure_is_memoized():
+    getter = FontGetter()
+    metrics = TextMetrics(font_getter=getter)
+    assert metrics.measure('On', 'font') == (20, 10)
+    assert metrics.measure('On', 'font') == (20, 10)
+    assert metrics.measure('On', 'font', 12) == (24, 12)
+
+    assert getter.calls == [('font', 10), ('font', 12)]
+    assert metrics.stats() == {'hits': 1, 'misses': 2, 'cached': 2}
+
+
+def test_measure_many_gets_the_font_once():
+    getter = FontGetter()
+    metrics = TextMetrics(font_getter=getter)
+    metrics.measure('Off', 'font')
+
+    sizes = metrics.measure_many(['On', 'Off', 'On', 'Done'], 'font')
+    assert sizes == {'On': (20, 10), 'Off': (30, 10), 'Done': (40, 10)}
+    assert getter.calls == [('font', 10), ('font', 10)]
+    assert (metrics.hits, metrics.misses) == (1, 3)
+
+
+def test_least_recently_measured_evicted():
+    metrics = TextMetrics(maxsize=2, font_getter=FontGetter())
+    metrics.measure('A', 'font')
+    metrics.measure('B', 'font')
+    metrics.measure('A', 'font')
+    metrics.measure('C', 'font')  # Evicts B, as A was used more recently
+
+    metrics.measure('A', 'font')
+    assert metrics.hits == 2
+    metrics.measure('B', 'font')
+    assert metrics.misses == 4
+
+    # Batches refresh the labels they hit too
+    metrics.measure_many(['A'], 'font')  # Cached: B, A
+    metrics.measure_many(['C'], 'font')  # Evicts B
+    assert metrics.stats() == {'hits': 3, 'misses': 5, 'cached': 2}
+    metrics.measure_many(['A', 'B'], 'font')
+    assert (metrics.hits, metrics.misses) == (4, 6)
+
+    metrics.clear()
+    assert metrics.stats() == {'hits': 0, 'misses': 0, 'cached': 0}
@@ -0,0 +1,38 @@
+from PIL import Image, ImageChops
+
+from diagrams.parser import parse
+from diagrams.renderer import GraphRenderer
+from diagrams.tiles import TileRenderer
+
+DOCUMENT = '''a := "Off State"
+b := "On State"
+(a) -> [b] -> <"Done">
+(a) <- [b]
+["Idle"] -> (a)
+["Idle"] -> <"Done">
+'''
+
+
+def test_stitched_tiles_match_a_full_render(default_font):
+    graph_renderer = GraphRenderer(parse(DOCUMENT))
+    full = graph_renderer.render()
+    assert full.getbbox() is not None
+    tiles = TileRenderer(graph_renderer.scene(), tile_size=37)
+    assert tiles.columns > 1 and tiles.rows > 1
+
+    stitched = Image.new('RGB', full.size)
+    for row, column, tile in tiles.tiles():
+        stitched.paste(tile, tiles.tile_box(row, column)[:2])
+    assert ImageChops.difference(full, stitched).getbbox() is None
+
+
+def test_render_box_matches_a_crop_of_a_full_render(default_font):
+    graph_renderer = GraphRenderer(parse(DOCUMENT))
+    full = graph_renderer.render()
+    tiles = TileRenderer(graph_renderer.scene())
+
+    # Boxes across shape edges, at odd offsets from the tile grid
+    for box in [(0, 0, full.width, full.height), (3, 7, 61, 45), (17, 30, 18, 90)]:
+        img = tiles.render_box(box)
+        assert img.size == (box[2] - box[0], box[3] - box[1])
+        assert ImageChops.difference(full.crop(box), img).getbbox() is None
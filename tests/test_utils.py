@@ -1,5 +1,12 @@
-from diagrams.utils.geometry import intersection_of_lines, cramers_rule
+import math
+
+from diagrams.utils.geometry import (
+    intersection_of_lines, cramers_rule,
+    half_planes, ray_exit_box, ray_exit_half_planes, ray_exit_rounded_box,
+)
 from diagrams.utils.graph import get_node_longest_chain
+from diagrams.utils.strings import SymbolTable
+from diagrams.utils.chains import strongly_connected_components
 
 from diagrams.graph import Graph, Node
 
@@ -27,6 +34,16 @@ def test_intersection_of_lines():
     assert expected[1] == round(observed[1], 2)
 
 
+def test_symbol_table():
+    symbols = SymbolTable()
+    assert symbols.intern('"On State"') == 0
+    assert symbols.intern('a') == 1
+    assert symbols.intern('"On State"') == 0
+    assert symbols.symbol(1) == 'a'
+    assert symbols.get('b') is None
+    assert len(symbols) == 2
+
+
 class TestGraphChains:
     def test_node_longest_chain1(self):
         n1 = Node('A', 'valueA', '(')
@@ -78,3 +95,112 @@ class TestGraphChains:
         assert chain4 == [n4.id, n2.id, n5.id]
         assert chain5 == [n5.id, n4.id, n2.id]
         assert chain6 == [n6.id]
+
+
+class TestChainAnalysis:
+    def test_strongly_connected_components(self):
+        # 0 -> 1 <-> 2 -> 3
+        component = strongly_connected_components([[1], [2], [1, 3], []])
+        assert component[1] == component[2]
+        assert len({component[0], component[1], component[3]}) == 3
+        # Sinks come first
+        assert component[3] < component[1] < component[0]
+
+    def test_node_chain_dag(self):
+        nodes = [Node(x, x, '(') for x in 'ABCDE']
+        a, b, c, d, e = nodes
+        a.adjacents = [b.id, c.id]
+        b.adjacents = [e.id]
+        c.adjacents = [d.id]
+        d.adjacents = [e.id]
+
+        graph = Graph(nodes)
+        assert graph.node_chain(a.id) == [a, c, d, e]
+        assert graph.node_chain(b.id) == [b, e]
+        assert graph.chains.chain_length(a.id) == 4
+
+    def test_node_chain_condenses_cycles(self):
+        nodes = [Node(x, x, '(') for x in 'ABCDEF']
+        n1, n2, n3, n4, n5, n6 = nodes
+        n1.adjacents = [n2.id, n3.id]
+        n2.adjacents = [n5.id]
+        n3.adjacents = [n4.id]
+        n4.adjacents = [n2.id, n6.id]
+        n5.adjacents = [n4.id]
+
+        graph = Graph(nodes)
+
+        def assert_path(chain):
+            for node, next_node in zip(chain, chain[1:]):
+                assert next_node.id in node.adjacents
+
+        # 2, 5 and 4 form a cycle, entered at 4 after 3 and left from 4
+        assert graph.node_chain(n1.id) == [n1, n3, n4, n6]
+        assert graph.node_chain(n2.id) == [n2, n5, n4, n6]
+        assert graph.node_chain(n6.id) == [n6]
+        for node in nodes:
+            assert_path(graph.node_chain(node.id))
+
+        # A cycle left from a node other than the last one visited
+        a, b, c, d = nodes = [Node(x, x, '(') for x in 'abcd']
+        a.adjacents = [b.id, c.id]
+        b.adjacents = [a.id]
+        c.adjacents = [a.id, d.id]
+        graph = Graph(nodes)
+        assert graph.node_chain(b.id) == [b, a, c, d]
+        for node in nodes:
+            assert_path(graph.node_chain(node.id))
+            assert graph.chains.chain_length(node.id) == len(graph.node_chain(node.id))
+
+    def test_components_walked_once(self):
+        # Ring a -> b -> c -> a, left from c to d, a sink ring d -> e -> d
+        a, b, c, d, e = nodes = [Node(x, x, '(') for x in 'abcde']
+        a.adjacents = [b.id]
+        b.adjacents = [c.id]
+        c.adjacents = [a.id, d.id]
+        d.adjacents = [e.id]
+        e.adjacents = [d.id]
+
+        graph = Graph(nodes)
+        chains = graph.chains
+        assert chains.chain(a.id) == [a.id, b.id, c.id, d.id, e.id]
+        assert chains.chain(b.id) == [b.id, c.id, d.id, e.id]
+        assert chains.chain(e.id) == [e.id, d.id]
+        # One tree per component, whichever node the chain enters it at
+        assert len(chains.toward) == 2
+        assert [chains.chain_length(node.id) for node in nodes] == [5, 4, 3, 2, 2]
+
+    def test_long_chain(self):
+        nodes = [Node(str(i), str(i), '[') for i in range(5000)]
+        for node, next_node in zip(nodes, nodes[1:]):
+            node.adjacents = [next_node.id]
+        nodes[-1].adjacents = [nodes[0].id]
+
+        graph = Graph(nodes)
+        assert graph.node_chain(nodes[10].id)[:2] == [nodes[10], nodes[11]]
+        assert len(graph.node_chain(nodes[10].id)) == 5000
+
+
+def test_ray_exit_box():
+    box = (-10, -5, 20, 5)
+    assert ray_exit_box(1, 0, box) == 20
+    assert ray_exit_box(-2, 0, box) == 5
+    assert ray_exit_box(1, 1, box) == 5
+    assert ray_exit_box(0, 0, box) == math.inf
+
+
+def test_ray_exit_rounded_box():
+    box = (-10, -10, 10, 10)
+    assert ray_exit_rounded_box(1, 0, box, 4) == 10
+    # Corner circle of radius 4 centered at (6, 6)
+    t = ray_exit_rounded_box(1, 1, box, 4)
+    assert math.isclose(t, 6 + 4 / math.sqrt(2))
+
+
+def test_ray_exit_half_planes():
+    planes = half_planes([(-10, -10), (10, -10), (10, 10), (-10, 10)])
+    assert ray_exit_half_planes(1, 0, planes) == 10
+    assert ray_exit_half_planes(0, -2, planes) == 5
+    # The same polygon counterclockwise
+    planes = half_planes([(-10, -10), (-10, 10), (10, 10), (10, -10)])
+    assert ray_exit_half_planes(1, 1, planes) == 10
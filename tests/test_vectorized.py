@@ -0,0 +1,43 @@
+import math
+
+import pytest
+
+from diagrams.utils.geometry import intersection_of_lines, rotate_point
+
+np = pytest.importorskip('numpy')
+
+from diagrams.utils.vectorized import clip_to_boxes, arrow_heads  # noqa
+
+
+def test_clip_to_boxes_matches_scalar():
+    boxes = [(0, 0, 100, 40), (0, 0, 100, 40), (200, 100, 240, 180)]
+    centers = [(50, 20), (50, 20), (220, 140)]
+    targets = [(300, 20), (70, 300), (0, 0)]
+
+    clipped = clip_to_boxes(centers, targets, boxes)
+
+    for (x0, y0, x1, y1), center, target, point in zip(boxes, centers, targets, clipped):
+        sides = [((x0, y0), (x1, y0)), ((x1, y0), (x1, y1)),
+                 ((x1, y1), (x0, y1)), ((x0, y1), (x0, y0))]
+        expected = next(filter(None, (intersection_of_lines((target, center), s) for s in sides)))
+        assert point == pytest.approx(expected)
+
+
+def test_clip_to_boxes_target_inside():
+    clipped = clip_to_boxes([(50, 20)], [(60, 25)], [(0, 0, 100, 40)])
+    assert clipped.tolist() == [[50, 20]]
+
+
+def test_arrow_heads():
+    head1, head2 = arrow_heads([(0, 0), (10, 10)], [(100, 0), (10, 50)])
+    rotated = rotate_point((-7, 0), math.pi / 6)
+    assert head1[0] == pytest.approx((100 + rotated[0], rotated[1]))
+    assert head2[0] == pytest.approx((100 + rotated[0], -rotated[1]))
+    assert head1[1] == pytest.approx((10 + 3.5, 50 - 7 * math.cos(math.pi / 6)))
+
+
+def test_arrow_heads_of_zero_length_arrows():
+    heads = arrow_heads([(3, 4), (0, 0)], [(3, 4), (10, 0)])
+    for head in heads:
+        assert np.isfinite(head).all()
+        assert head[0].tolist() == [3, 4]